@@ -0,0 +1,12 @@
+import os
+
+
+def data_dir():
+    """Directory for caches and stored conversations (CHATBOT_DATA_DIR, else ~/.chatbot-ollama)"""
+    path = os.environ.get("CHATBOT_DATA_DIR") or os.path.join(os.path.expanduser("~"), ".chatbot-ollama")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_path(name):
+    return os.path.join(data_dir(), name)
@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def read_prompts(path, id_field="id", prompt_field="prompt"):
+    """Yield (id, record) pairs from a JSONL file one line at a time"""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_number}: {e}", file=sys.stderr)
+                continue
+            if prompt_field not in record:
+                print(f"Skipping line {line_number}: no '{prompt_field}' field", file=sys.stderr)
+                continue
+            yield str(record.get(id_field, line_number)), record
+
+
+def completed_ids(path):
+    """IDs already answered successfully in an earlier (possibly killed) run"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not result.get("error"):
+                done.add(str(result.get("id")))
+    return done
+
+
+def terminate_partial_line(path):
+    # A run killed mid-write can leave half a line behind; start on a fresh one
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+class BatchRunner:
+    """Runs prompts from a JSONL file with a bounded number of requests in flight.
+
+    Results are appended to the output file as soon as each one finishes, and
+    prompts whose IDs already have a successful result there are skipped, so a
+    killed run can simply be started again.
+    """
+
+    def __init__(self, engine, model_name, concurrency=4, id_field="id", prompt_field="prompt"):
+        self.engine = engine
+        self.model_name = model_name
+        self.concurrency = max(1, concurrency)
+        self.id_field = id_field
+        self.prompt_field = prompt_field
+        self.write_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(self.concurrency)
+        self.counts = {"ok": 0, "error": 0, "skipped": 0}
+
+    def run(self, input_path, output_path):
+        done = completed_ids(output_path)
+        terminate_partial_line(output_path)
+        start_time = time.perf_counter()
+        with open(output_path, "a", encoding="utf-8") as output, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for item_id, record in read_prompts(input_path, self.id_field, self.prompt_field):
+                if item_id in done:
+                    self.counts["skipped"] += 1
+                    continue
+                # Block until a slot frees up so the input is read lazily
+                self.slots.acquire()
+                executor.submit(self.process, item_id, record, output)
+
+        elapsed = time.perf_counter() - start_time
+        print(f"Batch finished in {elapsed:.1f}s: {self.counts['ok']} ok, "
+              f"{self.counts['error']} failed, {self.counts['skipped']} already done", file=sys.stderr)
+        return self.counts
+
+    def process(self, item_id, record, output):
+        model_name = record.get("model", self.model_name)
+        result = {"id": item_id, "model": model_name}
+        try:
+            text, stats = self.engine.complete(
+                record[self.prompt_field],
+                model_name,
+                system=record.get("system"),
+                options=record.get("options")
+            )
+            result["response"] = text
+            result.update(stats)
+        except Exception as e:
+            result["error"] = str(e)
+        finally:
+            self.slots.release()
+
+        with self.write_lock:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            self.counts["error" if "error" in result else "ok"] += 1
+            print(f"[{item_id}] {'error: ' + result['error'] if 'error' in result else 'ok'}", file=sys.stderr)
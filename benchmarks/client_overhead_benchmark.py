@@ -0,0 +1,96 @@
+"""Per-turn client overhead of the three chat paths, measured against the fake server.
+
+- per-message: builds OllamaLLM and the prompt chain on every turn (original behaviour)
+- cached-chain: builds the chain once per model and reuses it
+- direct: posts to /api/chat over a pooled requests.Session, no LangChain
+
+The fake server answers instantly, so the timings are dominated by client work.
+
+    python benchmarks/client_overhead_benchmark.py --turns 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import requests
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_ollama import OllamaLLM
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import FakeOllama  # noqa: E402
+from chat_engine import CHAT_TEMPLATE  # noqa: E402
+
+MODEL = "llama3:latest"
+
+
+def per_message(base_url):
+    def turn(question):
+        model = OllamaLLM(model=MODEL, base_url=base_url)
+        chain = ChatPromptTemplate.from_template(CHAT_TEMPLATE) | model
+        return chain.invoke({"context": "", "question": question})
+    return turn
+
+
+def cached_chain(base_url):
+    model = OllamaLLM(model=MODEL, base_url=base_url)
+    chain = ChatPromptTemplate.from_template(CHAT_TEMPLATE) | model
+
+    def turn(question):
+        return chain.invoke({"context": "", "question": question})
+    return turn
+
+
+def direct(base_url):
+    session = requests.Session()
+
+    def turn(question):
+        payload = {"model": MODEL, "messages": [{"role": "user", "content": question}], "stream": False}
+        response = session.post(f"{base_url}/api/chat", json=payload)
+        return response.json()["message"]["content"]
+    return turn
+
+
+PATHS = {"per-message": per_message, "cached-chain": cached_chain, "direct": direct}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with FakeOllama() as fake:
+        for name, factory in PATHS.items():
+            turn = factory(fake.base_url)
+            for i in range(args.warmup):
+                turn(f"warmup {i}")
+            timings = []
+            for i in range(args.turns):
+                start = time.perf_counter()
+                turn(f"question {i}")
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[name] = {
+                "mean_ms": statistics.mean(timings),
+                "p50_ms": timings[len(timings) // 2],
+                "p95_ms": timings[int(len(timings) * 0.95) - 1],
+            }
+
+    print(f"{'path':>14} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, row in results.items():
+        print(f"{name:>14} {row['mean_ms']:>9.2f} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""Deterministic local stand-in for the Ollama HTTP API, used by the benchmarks.
+
+Serves /api/tags, /api/ps, /api/show, /api/generate, /api/chat, /api/embed,
+/api/pull (streamed progress) and /api/delete. Token rate, time to first token, pull
+speed and failures are configurable; failures are drawn from a seeded RNG so
+a run is reproducible.
+
+    python benchmarks/fake_ollama.py --port 11435 --token-rate 40 --failure-rate 0.05
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODELS = ["llama3:latest", "mistral:latest"]
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting, e.g. a shutdown past its deadline
+            self.close_connection = True
+
+    def send_stream(self, items):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for item in items:
+                if self.fake.dropped:
+                    # Cut the stream without its final chunk, like a node that went away mid-answer
+                    self.close_connection = True
+                    return
+                line = json.dumps(item).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream, e.g. a cancelled pull; stop like Ollama does
+            self.close_connection = True
+
+    def injected_failure(self):
+        """Answer with a 503 when the configured failure rate says so"""
+        if self.fake.dropped:
+            # Like a node that went away: the connection closes without an answer
+            self.close_connection = True
+            return True
+        if self.path != "/" and self.fake.roll(self.fake.failure_rate):
+            self.send_json({"error": "fake server: injected failure"}, 503)
+            return True
+        return False
+
+    def do_GET(self):
+        if self.injected_failure():
+            return
+        if self.path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/api/tags":
+            self.fake.tags_requests += 1
+            self.send_json({"models": [self.fake.model_info(name) for name in self.fake.models]})
+        elif self.path == "/api/ps":
+            self.send_json({"models": [self.fake.model_info(name) for name in list(self.fake.loaded)]})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_DELETE(self):
+        request = self.read_json()
+        if self.injected_failure():
+            return
+        name = request.get("model") or request.get("name")
+        if self.path != "/api/delete":
+            self.send_json({"error": "not found"}, 404)
+        elif name not in self.fake.models:
+            self.send_json({"error": f"model '{name}' not found"}, 404)
+        else:
+            self.fake.models.remove(name)
+            self.fake.loaded.discard(name)
+            self.send_json({})
+
+    def do_POST(self):
+        request = self.read_json()
+        if self.injected_failure():
+            return
+        if self.path == "/api/chat":
+            self.generate(request, chat=True)
+        elif self.path == "/api/generate":
+            self.generate(request, chat=False)
+        elif self.path == "/api/embed":
+            inputs = request.get("input", "")
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self.send_json({"model": request.get("model"), "embeddings": [self.fake.embed(t) for t in inputs]})
+        elif self.path == "/api/show":
+            self.fake.shows += 1
+            name = request.get("model") or request.get("name")
+            if name not in self.fake.models:
+                self.send_json({"error": f"model '{name}' not found"}, 404)
+            else:
+                self.send_json(self.fake.show_info(name))
+        elif self.path == "/api/pull":
+            self.pull(request.get("model") or request.get("name", ""), request.get("stream", True))
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def generate(self, request, chat):
+        model = request.get("model", "")
+        if model not in self.fake.models:
+            self.send_json({"error": f"model '{model}' not found"}, 404)
+            return
+        if request.get("keep_alive") in (0, "0", "0s"):
+            time.sleep(self.fake.unload_delay)
+            self.fake.loaded.discard(model)
+            self.send_json({"model": model, "done": True, "done_reason": "unload"})
+            return
+        load_start = time.perf_counter_ns()
+        if model not in self.fake.loaded:
+            time.sleep(self.fake.load_delay)
+            self.fake.loaded.add(model)
+        load_duration = time.perf_counter_ns() - load_start
+        if not request.get("prompt") and not request.get("messages"):
+            # An empty request only loads the model, like Ollama
+            self.send_json({"model": model, "done": True, "done_reason": "load"})
+            return
+        self.fake.generations += 1
+        if chat:
+            prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+        else:
+            prompt = request.get("prompt", "")
+
+        tokens = self.fake.answer_tokens()
+        start = time.perf_counter_ns()
+        time.sleep(self.fake.latency)
+
+        def chunk(text, done=False):
+            item = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+            if chat:
+                item["message"] = {"role": "assistant", "content": text}
+            else:
+                item["response"] = text
+            if done:
+                item.update({
+                    "done_reason": "stop",
+                    "total_duration": time.perf_counter_ns() - start,
+                    "load_duration": load_duration,
+                    "prompt_eval_count": max(1, len(prompt) // 4),
+                    "prompt_eval_duration": 0,
+                    "eval_count": len(tokens),
+                    "eval_duration": int(len(tokens) * self.fake.token_delay * 1e9),
+                })
+            return item
+
+        if not request.get("stream", True):
+            time.sleep(self.fake.token_delay * len(tokens))
+            self.send_json(chunk("".join(tokens), done=True))
+            return
+
+        fail_at = len(tokens) // 2 if self.fake.roll(self.fake.stream_failure_rate) else None
+
+        def items():
+            for i, token in enumerate(tokens):
+                if i == fail_at:
+                    yield {"error": "fake server: generation failed mid-stream"}
+                    return
+                time.sleep(self.fake.token_delay)
+                yield chunk(token)
+            yield chunk("", done=True)
+
+        self.send_stream(items())
+
+    def pull(self, name, stream):
+        """Stream pull progress like Ollama, resuming from where an interrupted pull stopped"""
+        fake = self.fake
+        digest = "sha256:" + hashlib.sha256(name.encode("utf-8")).hexdigest()
+        total = fake.pull_size
+        fail_at = fake.pull_steps // 2 if fake.roll(fake.stream_failure_rate) else None
+
+        def items():
+            yield {"status": "pulling manifest"}
+            completed = fake.partial_pulls.get(name, 0)
+            step = max(1, total // fake.pull_steps)
+            i = 0
+            while completed < total:
+                if i == fail_at:
+                    yield {"error": "fake server: pull failed mid-stream"}
+                    return
+                time.sleep(fake.pull_delay)
+                completed = min(total, completed + step)
+                fake.partial_pulls[name] = completed
+                yield {"status": f"pulling {digest[7:19]}", "digest": digest, "total": total, "completed": completed}
+                i += 1
+            yield {"status": "verifying sha256 digest"}
+            yield {"status": "writing manifest"}
+            fake.partial_pulls.pop(name, None)
+            if name not in fake.models:
+                fake.models.append(name)
+            yield {"status": "success"}
+
+        if stream:
+            self.send_stream(items())
+        else:
+            last = {}
+            for last in items():
+                if "error" in last:
+                    self.send_json(last, 500)
+                    return
+            self.send_json(last)
+
+
+class FakeOllama:
+    """Threaded fake server; use as a context manager or call start()/stop()"""
+
+    def __init__(self, host="127.0.0.1", port=0, models=None, latency=0.0,
+                 token_delay=0.0, unload_delay=0.0, answer="This is a canned answer from the fake server.",
+                 failure_rate=0.0, stream_failure_rate=0.0, pull_size=100_000_000, pull_steps=200,
+                 pull_delay=0.0, load_delay=0.0, seed=0):
+        self.models = list(models or DEFAULT_MODELS)
+        self.loaded = set()
+        self.unload_delay = unload_delay
+        self.load_delay = load_delay
+        self.latency = latency
+        self.token_delay = token_delay
+        self.answer = answer
+        self.failure_rate = failure_rate
+        self.stream_failure_rate = stream_failure_rate
+        self.pull_size = pull_size
+        self.pull_steps = pull_steps
+        self.pull_delay = pull_delay
+        self.partial_pulls = {}
+        # Per-model size in bytes reported by /api/tags and /api/ps
+        self.sizes = {}
+        # Per-model modification time; changing it also changes the model's digest
+        self.modified = {}
+        # Requests served, for checking what the client caches
+        self.tags_requests = 0
+        self.shows = 0
+        self.generations = 0
+        self.dropped = False
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), FakeOllamaHandler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def roll(self, probability):
+        if probability <= 0:
+            return False
+        with self.rng_lock:
+            return self.rng.random() < probability
+
+    def answer_tokens(self):
+        words = self.answer.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def embed(self, text, dim=64):
+        """Bag-of-words hashing embedding, so texts sharing words get similar vectors"""
+        vector = [0.0] * dim
+        for word in text.lower().split():
+            digest = hashlib.md5(word.strip(".,!?").encode("utf-8")).digest()
+            vector[digest[0] % dim] += 1.0 if digest[1] % 2 else -1.0
+        return vector
+
+    def model_info(self, name):
+        modified_at = self.modified.get(name, "2025-01-01T00:00:00Z")
+        return {
+            "name": name,
+            "model": name,
+            "modified_at": modified_at,
+            "size": self.sizes.get(name, 4_000_000_000),
+            "digest": hashlib.sha256(f"{name}@{modified_at}".encode("utf-8")).hexdigest(),
+            "details": {"family": "llama", "parameter_size": "8B", "quantization_level": "Q4_0"},
+        }
+
+    def show_info(self, name):
+        info = self.model_info(name)
+        return {
+            "modelfile": f"FROM {name}",
+            "parameters": "stop \"<|eot_id|>\"",
+            "template": "{{ .Prompt }}",
+            "details": info["details"],
+            "model_info": {"general.architecture": "llama", "general.parameter_count": 8_030_261_248,
+                           "llama.context_length": 8192},
+            "modified_at": info["modified_at"],
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def drop(self):
+        """Stop answering, also on connections that are already open"""
+        self.dropped = True
+        self.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def canned_answer(words):
+    vocabulary = ["the", "model", "answer", "token", "stream", "local", "server", "fast", "reply", "test"]
+    return " ".join(vocabulary[i % len(vocabulary)] for i in range(words)) + "."
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="tokens per second (0 = as fast as possible)")
+    parser.add_argument("--answer-words", type=int, default=0, help="length of the canned answer")
+    parser.add_argument("--load-delay", type=float, default=0.0, help="seconds loading a model into memory takes")
+    parser.add_argument("--unload-delay", type=float, default=0.0, help="seconds an unload takes")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--stream-failure-rate", type=float, default=0.0,
+                        help="share of streams that end with an error halfway")
+    parser.add_argument("--pull-size", type=int, default=100_000_000, help="bytes a pull reports")
+    parser.add_argument("--pull-steps", type=int, default=200, help="progress lines per pull")
+    parser.add_argument("--pull-delay", type=float, default=0.0, help="seconds between progress lines")
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--startup-delay", type=float, default=0.0,
+                        help="seconds to wait before listening, like a slow `ollama serve`")
+    args = parser.parse_args()
+
+    time.sleep(args.startup_delay)
+    fake = FakeOllama(
+        args.host, args.port, models=args.models, latency=args.latency,
+        token_delay=1 / args.token_rate if args.token_rate > 0 else 0.0,
+        unload_delay=args.unload_delay, load_delay=args.load_delay, failure_rate=args.failure_rate,
+        stream_failure_rate=args.stream_failure_rate, pull_size=args.pull_size,
+        pull_steps=args.pull_steps, pull_delay=args.pull_delay, seed=args.seed
+    )
+    if args.answer_words:
+        fake.answer = canned_answer(args.answer_words)
+    print(f"Fake Ollama listening on {fake.base_url}", flush=True)
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
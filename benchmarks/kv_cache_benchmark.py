@@ -0,0 +1,96 @@
+"""Compare per-turn prompt evaluation time of the two conversation modes.
+
+"history" rebuilds the full text prompt every turn like the original template
+path; "chat" sends a growing message list to /api/chat so the server can reuse
+its KV cache for the unchanged prefix. Run against a live Ollama server:
+
+    python benchmarks/kv_cache_benchmark.py --model llama3 --turns 50
+"""
+import argparse
+import json
+import statistics
+import sys
+
+import requests
+
+TEMPLATE = """
+Answer the question below.
+Here is the conversation history:
+{context}
+Question: {question}
+Answer:
+"""
+
+
+def question(turn):
+    return f"Turn {turn}: name one fact about the number {turn} in a single short sentence."
+
+
+def run_history(base_url, model, turns, options):
+    context = ""
+    for turn in range(1, turns + 1):
+        prompt = TEMPLATE.format(context=context, question=question(turn))
+        payload = {"model": model, "prompt": prompt, "stream": False, "options": options}
+        data = requests.post(f"{base_url}/api/generate", json=payload, timeout=600).json()
+        answer = data.get("response", "")
+        context += f"\nUser: {question(turn)}\nAI: {answer}"
+        yield turn, data
+
+
+def run_chat(base_url, model, turns, options):
+    messages = []
+    for turn in range(1, turns + 1):
+        messages.append({"role": "user", "content": question(turn)})
+        payload = {"model": model, "messages": messages, "stream": False, "options": options}
+        data = requests.post(f"{base_url}/api/chat", json=payload, timeout=600).json()
+        messages.append({"role": "assistant", "content": data.get("message", {}).get("content", "")})
+        yield turn, data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="llama3")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--host", default="http://localhost:11434")
+    parser.add_argument("--num-predict", type=int, default=48)
+    parser.add_argument("--modes", default="history,chat")
+    parser.add_argument("--output", help="write per-turn results as JSON to this file")
+    args = parser.parse_args()
+
+    options = {"temperature": 0, "seed": 0, "num_predict": args.num_predict}
+    runners = {"history": run_history, "chat": run_chat}
+    results = {}
+
+    for mode in args.modes.split(","):
+        requests.post(f"{args.host}/api/generate", json={"model": args.model, "keep_alive": 0}, timeout=60)
+        rows = []
+        print(f"\n== {mode} ==")
+        print(f"{'turn':>4} {'prompt tokens':>14} {'prompt eval ms':>15}")
+        for turn, data in runners[mode](args.host, args.model, args.turns, options):
+            if "error" in data:
+                print(f"Error: {data['error']}")
+                return 1
+            row = {
+                "turn": turn,
+                "prompt_eval_count": data.get("prompt_eval_count", 0),
+                "prompt_eval_ms": data.get("prompt_eval_duration", 0) / 1e6,
+            }
+            rows.append(row)
+            print(f"{turn:>4} {row['prompt_eval_count']:>14} {row['prompt_eval_ms']:>15.1f}")
+        results[mode] = rows
+
+    print("\nMean prompt eval ms, first vs last 10 turns (turn 1 excluded, it includes the system prompt):")
+    for mode, rows in results.items():
+        head = [r["prompt_eval_ms"] for r in rows[1:11]]
+        tail = [r["prompt_eval_ms"] for r in rows[-10:]]
+        if head and tail:
+            print(f"  {mode:>8}: {statistics.mean(head):8.1f} -> {statistics.mean(tail):8.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+"""Load test of the client paths against the bundled fake Ollama server.
+
+Scenarios:
+- chat: sequential conversation turns through ChatEngine, then concurrent
+  single prompts; time to first token, latency and client overhead
+- models: /api/tags with many installed models, with and without injected 503s,
+  and the model catalog's first refresh (an /api/show per model) against
+  later ones that find nothing changed
+- pull: /api/pull progress handling with thousands of progress lines, and
+  several throttled pulls through the download queue, one at a time and in
+  parallel
+- shutdown: unloading the running models when the window closes, including
+  a server that never answers the unload and one that never answers at all
+- router: concurrent chat prompts through OllamaRouter over several fake
+  nodes, how evenly they land on the nodes with the model loaded, and the
+  same prompts again after one node dropped
+- io: a burst of Unload clicks over the fake server's models, with a
+  thread started per click against the app's path: an operation on the
+  I/O loop per model, sent through AsyncOllamaClient, which later clicks
+  on the same model join
+- startup: time from spawning a slow-starting server until it is reported
+  ready, and until a server that crashes on start is reported as failed
+
+Results are written as JSON; pass an earlier results file as --baseline to
+compare, which exits with status 1 when a metric got worse by more than the
+tolerance.
+
+    python benchmarks/load_test.py --output before.json
+    python benchmarks/load_test.py --baseline before.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import FakeOllama, canned_answer  # noqa: E402
+from chat_engine import ChatEngine  # noqa: E402
+from ollama_client import AsyncOllamaClient, OllamaClient, OllamaError  # noqa: E402
+from ollama_server import OllamaServer  # noqa: E402
+from download_manager import DONE, DownloadManager  # noqa: E402
+from model_catalog import ModelCatalog  # noqa: E402
+from io_loop import IOLoop  # noqa: E402
+from ollama_router import OllamaRouter  # noqa: E402
+from model_residency import ResidencyManager  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "latest.json")
+
+
+def quantiles(prefix, values, scale=1000):
+    """p50/p95/mean of `values` (seconds) as `{prefix}_p50_ms`, ..."""
+    values = sorted(values)
+    if not values:
+        return {}
+    return {
+        f"{prefix}_p50_ms": values[len(values) // 2] * scale,
+        f"{prefix}_p95_ms": values[max(0, int(len(values) * 0.95) - 1)] * scale,
+        f"{prefix}_mean_ms": statistics.mean(values) * scale,
+    }
+
+
+def bench_chat(args):
+    token_delay = 1 / args.token_rate
+    with FakeOllama(latency=args.latency, token_delay=token_delay, answer=canned_answer(args.answer_words)) as fake:
+        model = fake.models[0]
+        server_time = args.latency + len(fake.answer_tokens()) * token_delay
+        # A budget this large keeps background summarization out of the measurement
+        engine = ChatEngine(OllamaClient(fake.base_url), budget_tokens=10_000_000)
+        engine.complete("warm up", model)
+
+        ttfts, latencies = [], []
+        for turn in range(args.turns):
+            stats = {}
+            for _ in engine.iter_reply(f"Question number {turn}?", model, chat_mode=True, stats=stats):
+                pass
+            ttfts.append(stats["ttft_s"])
+            latencies.append(stats["latency_s"])
+        results = {**quantiles("turn_ttft", ttfts), **quantiles("turn_latency", latencies)}
+        results.update(quantiles("turn_overhead", [latency - server_time for latency in latencies]))
+
+        def one(i):
+            start = time.perf_counter()
+            engine.complete(f"Concurrent prompt {i}", model)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            concurrent = list(executor.map(one, range(args.requests)))
+        elapsed = time.perf_counter() - start
+        results.update(quantiles("concurrent_latency", concurrent))
+        results["concurrent_requests_per_s"] = args.requests / elapsed
+    return results
+
+
+def bench_models(args):
+    models = [f"model-{i:04d}:latest" for i in range(args.models)]
+    results = {}
+    for label, failure_rate in (("tags", 0.0), ("tags_with_failures", args.failure_rate)):
+        with FakeOllama(models=models, failure_rate=failure_rate, seed=1) as fake:
+            client = OllamaClient(fake.base_url)
+            client.list_models()
+            timings, failures = [], 0
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                try:
+                    client.list_models()
+                except OllamaError:
+                    failures += 1
+                timings.append(time.perf_counter() - start)
+        results.update(quantiles(label, timings))
+        results[f"{label}_success_rate"] = 1 - failures / args.requests
+
+    with FakeOllama(models=models) as fake:
+        catalog = ModelCatalog(OllamaClient(fake.base_url))
+        start = time.perf_counter()
+        catalog.refresh()
+        results["catalog_first_refresh_s"] = time.perf_counter() - start
+        timings = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            catalog.refresh()
+            timings.append(time.perf_counter() - start)
+        results.update(quantiles("catalog_refresh", timings))
+    return results
+
+
+def pull_all(base_url, names, concurrency):
+    """Pull `names` through a DownloadManager; returns (seconds, share that completed)"""
+    manager = DownloadManager(OllamaClient(base_url), concurrency=concurrency)
+    manager.start()
+    start = time.perf_counter()
+    downloads = [manager.enqueue(name) for name in names]
+    for download in downloads:
+        download.finished.wait()
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(download.state == DONE for download in downloads) / len(downloads)
+
+
+def bench_pull(args):
+    with FakeOllama(pull_steps=args.pull_steps, pull_size=args.pull_steps * 1_000_000) as fake:
+        elapsed, completed = pull_all(fake.base_url, ["bench:latest"], 1)
+    # Manifest, layer progress, verifying, writing and success
+    lines = args.pull_steps + 4
+    results = {
+        "pull_lines": lines,
+        "pull_lines_per_s": lines / elapsed,
+        "pull_line_us": elapsed / lines * 1e6,
+        "pull_completed_rate": completed,
+    }
+    # The server limits each stream's rate, as a slow registry connection would
+    names = [f"bench-{i}:latest" for i in range(args.pulls)]
+    with FakeOllama(pull_steps=100, pull_delay=0.01) as fake:
+        serial, _ = pull_all(fake.base_url, names, 1)
+        parallel, completed = pull_all(fake.base_url, names, args.pull_concurrency)
+    results.update({
+        "pull_queue_serial_s": serial,
+        "pull_queue_parallel_s": parallel,
+        "pull_queue_completed_rate": completed,
+    })
+    return results
+
+
+def bench_shutdown(args):
+    results = {}
+    scenarios = (("shutdown", args.unload_delay), ("shutdown_stuck", args.deadline * 5))
+    for label, unload_delay in scenarios:
+        with FakeOllama(models=[f"model-{i}:latest" for i in range(args.loaded)], unload_delay=unload_delay) as fake:
+            fake.loaded.update(fake.models)
+            client = OllamaClient(fake.base_url)
+            start = time.perf_counter()
+            unloaded = client.unload_running(deadline=args.deadline)
+            results[f"{label}_s"] = time.perf_counter() - start
+            results[f"{label}_unloaded_rate"] = len(unloaded) / args.loaded
+
+    # A server that accepts connections but never answers, not even /api/ps
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(16)
+        client = OllamaClient(f"http://127.0.0.1:{listener.getsockname()[1]}")
+        start = time.perf_counter()
+        client.unload_running(deadline=args.deadline)
+        results["shutdown_silent_s"] = time.perf_counter() - start
+    return results
+
+
+def bench_router(args):
+    token_delay = 1 / args.token_rate
+    model, other = "bench:latest", "other:latest"
+    fakes = [FakeOllama(models=[model, other], latency=args.latency, token_delay=token_delay,
+                        answer=canned_answer(args.answer_words)).start() for _ in range(args.nodes)]
+    # The model is in memory on every node but the last, which has another model loaded
+    for fake in fakes[:-1]:
+        fake.loaded.add(model)
+    fakes[-1].loaded.add(other)
+    router = OllamaRouter([fake.base_url for fake in fakes], interval=0.2)
+
+    def one(i):
+        return "".join(router.chat(model, [{"role": "user", "content": f"Routed prompt {i}"}]))
+
+    def run():
+        failures = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for future in [executor.submit(one, i) for i in range(args.requests)]:
+                try:
+                    future.result()
+                except (OllamaError, requests.exceptions.RequestException):
+                    failures += 1
+        return time.perf_counter() - start, 1 - failures / args.requests
+
+    try:
+        elapsed, success = run()
+        counts = [fake.generations for fake in fakes[:-1]]
+        results = {
+            "router_requests_per_s": args.requests / elapsed,
+            "router_success_rate": success,
+            # Share of prompts answered by a node that already had the model loaded
+            "router_resident_rate": sum(counts) / args.requests,
+            # Fewest over most prompts on one of those nodes; 1.0 is an even spread
+            "router_balance_rate": min(counts) / max(counts) if max(counts) else 0.0,
+        }
+        fakes[0].drop()
+        elapsed, success = run()
+        results["router_failover_s"] = elapsed
+        results["router_failover_success_rate"] = success
+    finally:
+        router.stop()
+        for fake in fakes[1:]:
+            fake.stop()
+    return results
+
+
+def bench_io(args):
+    results = {}
+    with FakeOllama(unload_delay=args.unload_delay / 10) as fake:
+        client = OllamaClient(fake.base_url)
+        models = fake.models
+        calls = []
+
+        def click(i):
+            calls.append(i)
+            client.unload(models[i % len(models)])
+
+        base = threading.active_count()
+        peak = base
+        start = time.perf_counter()
+        threads = [threading.Thread(target=click, args=(i,), daemon=True) for i in range(args.clicks)]
+        for thread in threads:
+            thread.start()
+            peak = max(peak, threading.active_count())
+        for thread in threads:
+            thread.join()
+        results["thread_per_click_s"] = time.perf_counter() - start
+        results["thread_per_click_peak_threads"] = peak - base
+        results["thread_per_click_calls"] = len(calls)
+
+        # What the Unload button does: unload through the async client, then refresh what is resident
+        calls.clear()
+        io = IOLoop().start()
+        aclient = AsyncOllamaClient([fake.base_url])
+        residency = ResidencyManager(client)
+
+        def unload(model_name):
+            async def run():
+                calls.append(model_name)
+                await aclient.unload(model_name)
+                await io.blocking(residency.refresh)
+            return run
+
+        base = threading.active_count()
+        peak = base
+        start = time.perf_counter()
+        operations = set()
+        for i in range(args.clicks):
+            model_name = models[i % len(models)]
+            operations.add(io.submit("model", unload(model_name), key=("unload", model_name)))
+            peak = max(peak, threading.active_count())
+        for operation in operations:
+            operation.result()
+        results["io_loop_s"] = time.perf_counter() - start
+        results["io_loop_peak_threads"] = peak - base
+        results["io_loop_calls"] = len(calls)
+        io.submit("shutdown", aclient.aclose).result()
+        io.stop()
+    return results
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_startup(args):
+    port = free_port()
+    fake_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_ollama.py")
+    crash = "import sys; print('Error: listen tcp 127.0.0.1:11434: bind: permission denied', flush=True); sys.exit(1)"
+    commands = (
+        ("startup", [sys.executable, fake_script, "--port", str(port), "--startup-delay", str(args.startup_delay)]),
+        ("startup_crash", [sys.executable, "-c", crash]),
+    )
+    results = {}
+    # The server's log is where its "Listening on" line and crash message are read from
+    log_path = os.path.join(tempfile.mkdtemp(), "serve.log")
+    for label, command in commands:
+        server = OllamaServer(OllamaClient(f"http://127.0.0.1:{port}"), command, log_path=log_path)
+        start = time.perf_counter()
+        ready, _ = server.start(deadline=args.start_deadline)
+        results[f"{label}_s"] = time.perf_counter() - start
+        if label == "startup":
+            results["startup_ready_rate"] = 1.0 if ready else 0.0
+        if server.process is not None and server.process.poll() is None:
+            server.process.terminate()
+            server.process.wait()
+    # Server time is the configured delay; the rest is how late readiness was noticed
+    results["startup_detection_delay_s"] = results["startup_s"] - args.startup_delay
+    return results
+
+
+SCENARIOS = {
+    "chat": bench_chat,
+    "models": bench_models,
+    "pull": bench_pull,
+    "shutdown": bench_shutdown,
+    "router": bench_router,
+    "io": bench_io,
+    "startup": bench_startup,
+}
+
+
+def higher_is_better(metric):
+    return metric.endswith(("_per_s", "_rate"))
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every metric present in both runs; return the regressions"""
+    regressions = []
+    for scenario, metrics in results["scenarios"].items():
+        for metric, value in metrics.items():
+            before = baseline.get("scenarios", {}).get(scenario, {}).get(metric)
+            if before is None or metric.endswith("_lines"):
+                continue
+            if before == 0:
+                change = 0.0 if value == 0 else float("inf")
+            else:
+                change = (value - before) / abs(before)
+            worse = -change if higher_is_better(metric) else change
+            flag = "REGRESSION" if worse > tolerance else ""
+            if flag:
+                regressions.append(f"{scenario}.{metric}")
+            print(f"  {scenario}.{metric:<36} {before:>12.3f} -> {value:>12.3f}  {change:+7.1%} {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--turns", type=int, default=50, help="sequential chat turns")
+    parser.add_argument("--requests", type=int, default=200, help="concurrent prompts and /api/tags calls")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--token-rate", type=float, default=500.0, help="fake server tokens per second")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake server seconds before the first token")
+    parser.add_argument("--answer-words", type=int, default=32)
+    parser.add_argument("--models", type=int, default=200, help="installed models reported by /api/tags")
+    parser.add_argument("--failure-rate", type=float, default=0.2, help="503 share for the failure run")
+    parser.add_argument("--pull-steps", type=int, default=5000, help="progress lines per pull")
+    parser.add_argument("--pulls", type=int, default=4, help="models pulled through the download queue")
+    parser.add_argument("--pull-concurrency", type=int, default=2, help="parallel pulls in the download queue")
+    parser.add_argument("--clicks", type=int, default=100, help="clicks in the io burst")
+    parser.add_argument("--nodes", type=int, default=3, help="fake servers behind the router")
+    parser.add_argument("--loaded", type=int, default=3, help="models loaded at shutdown")
+    parser.add_argument("--unload-delay", type=float, default=0.2)
+    parser.add_argument("--deadline", type=float, default=1.0, help="shutdown deadline in seconds")
+    parser.add_argument("--startup-delay", type=float, default=1.0, help="seconds the fake server takes to start")
+    parser.add_argument("--start-deadline", type=float, default=30.0)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the results JSON")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    results = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "scenarios": {},
+    }
+    for name in args.scenarios:
+        start = time.perf_counter()
+        metrics = SCENARIOS[name](args)
+        results["scenarios"][name] = metrics
+        print(f"{name} ({time.perf_counter() - start:.1f}s)")
+        for metric, value in metrics.items():
+            print(f"  {metric:<36} {value:>12.3f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
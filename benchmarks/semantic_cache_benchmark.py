@@ -0,0 +1,88 @@
+"""Lookup latency of the semantic cache with a full index of random embeddings.
+
+    python benchmarks/semantic_cache_benchmark.py --entries 100000 --dim 768
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_cache import SemanticCache, normalize  # noqa: E402
+
+
+def fill(cache, entries, dim, models):
+    """Write random unit vectors straight into the matrix; the slow path is add(), not lookup()"""
+    rng = np.random.default_rng(0)
+    cache.add(models[0], "seed", rng.standard_normal(dim), "seed")
+    model_ids = [cache.model_id(name) for name in models]
+    for start in range(0, entries, 10_000):
+        end = min(entries, start + 10_000)
+        block = rng.standard_normal((end - start, dim)).astype(np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        cache.vectors[start:end] = block
+        cache.codes[start:end] = cache.encode(block)
+        cache.row_models[start:end] = np.resize(model_ids, end - start)
+    cache.db.executemany(
+        "INSERT OR REPLACE INTO entries (row, model_id, question, response) VALUES (?, ?, ?, ?)",
+        ((row, model_ids[row % len(model_ids)], f"question {row}", f"answer {row}") for row in range(entries))
+    )
+    cache.db.commit()
+    cache.count = entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    models = ["llama3:latest", "mistral:latest"]
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SemanticCache(directory, "bench-embed", capacity=args.entries)
+        fill(cache, args.entries, args.dim, models)
+
+        rng = np.random.default_rng(1)
+        queries = rng.standard_normal((args.lookups, args.dim)).astype(np.float32)
+        # Half of the queries are near-duplicates of stored questions and should hit
+        for i in range(0, args.lookups, 2):
+            queries[i] = normalize(cache.vectors[i * 7 % args.entries]) + rng.normal(0, 0.005, args.dim)
+            queries[i] = normalize(queries[i])
+
+        for query in queries[:20]:
+            cache.lookup(models[0], query)
+        cache.hits = cache.misses = 0
+
+        timings = []
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            cache.lookup(models[(i * 7) % len(models)], query)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results = {
+            "entries": args.entries,
+            "dim": args.dim,
+            "mean_ms": statistics.mean(timings),
+            "p50_ms": timings[len(timings) // 2],
+            "p95_ms": timings[int(len(timings) * 0.95) - 1],
+            **cache.stats(),
+        }
+
+    print(f"{args.entries} entries x {args.dim} dims: mean {results['mean_ms']:.3f} ms, "
+          f"p50 {results['p50_ms']:.3f} ms, p95 {results['p95_ms']:.3f} ms "
+          f"({results['hits']} hits, {results['misses']} misses)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
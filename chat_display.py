@@ -0,0 +1,205 @@
+from collections import deque
+from itertools import islice
+
+import customtkinter as ctk
+
+# Messages kept in the text widget at once; the rest only live in the buffer
+MAX_RENDERED = 200
+# Messages rendered or loaded at a time when scrolling past the rendered window
+RENDER_PAGE = 50
+# Tk mark at the end of the streamed message's text, where streamed text is inserted
+STREAM_MARK = "stream_end"
+
+
+class ChatDisplay:
+    """Chat transcript that only keeps a window of messages in the Tk widget.
+
+    Every message is kept as one formatted string in `messages`; the text
+    widget shows the slice [first, last) of it. Appending while the view
+    follows the end inserts one message and drops the oldest rendered one,
+    so inserting costs the same however long the session is. Scrolling to
+    either edge of the rendered window renders the next page from the buffer
+    and drops a page at the other edge. When the buffer itself runs out at
+    the top, `load_older` is asked for earlier messages (oldest first).
+    A streamed message keeps its place while it grows: messages appended
+    before it ends go after it.
+
+    All methods must be called from the Tk thread.
+    """
+
+    def __init__(self, parent, load_older=None, max_rendered=MAX_RENDERED, page=RENDER_PAGE):
+        self.load_older = load_older
+        self.max_rendered = max_rendered
+        self.page = page
+        self.messages = []
+        self.first = 0
+        self.last = 0
+        self.line_counts = deque()
+        self.rendered_lines = 0
+        self.following = True
+        self.paging_scheduled = False
+        # Index in `messages` of the message being streamed
+        self.streaming = None
+
+        self.frame = ctk.CTkFrame(parent, fg_color="transparent")
+        self.frame.grid_columnconfigure(0, weight=1)
+        self.frame.grid_rowconfigure(0, weight=1)
+        self.textbox = ctk.CTkTextbox(self.frame, wrap="word", activate_scrollbars=False)
+        self.textbox.grid(row=0, column=0, sticky="nsew")
+        self.textbox.configure(state="disabled")
+        self.scrollbar = ctk.CTkScrollbar(self.frame, command=self.textbox.yview)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.textbox.configure(yscrollcommand=self.on_scroll)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def append(self, text):
+        """Add a finished message (including its trailing newline) at the end"""
+        self.append_many([text])
+
+    def append_many(self, texts):
+        start = len(self.messages)
+        self.messages.extend(texts)
+        if self.last != start:
+            return
+        if self.following:
+            if len(self.messages) - start >= self.max_rendered:
+                self.set_messages(self.messages)
+                return
+            self.render_bottom(self.messages[start:])
+            while len(self.line_counts) > self.max_rendered:
+                self.drop_top()
+            self.textbox.see("end")
+        else:
+            # While the user reads further up, new messages past a full window stay
+            # in the buffer until they scroll down to them
+            room = self.max_rendered - len(self.line_counts)
+            self.render_bottom(self.messages[start:start + max(0, room)])
+
+    def begin_stream(self, text):
+        """Start a message whose text will keep growing through extend_last until end_stream"""
+        self.append(text + "\n")
+        self.streaming = len(self.messages) - 1
+        self.place_stream_mark()
+
+    def extend_last(self, text):
+        """Add text to the streamed message, wherever it is in the transcript"""
+        if self.streaming is None:
+            return
+        # The message keeps its trailing newline; the text goes in front of it
+        self.messages[self.streaming] = self.messages[self.streaming][:-1] + text + "\n"
+        if self.first <= self.streaming < self.last:
+            self.edit(lambda: self.textbox.insert(STREAM_MARK, text))
+            lines = text.count("\n")
+            self.line_counts[self.streaming - self.first] += lines
+            self.rendered_lines += lines
+            if self.following:
+                self.textbox.see("end")
+
+    def end_stream(self):
+        self.streaming = None
+
+    def place_stream_mark(self):
+        if self.streaming is None or not self.first <= self.streaming < self.last:
+            return
+        # The streamed message ends on the line where its line counts add up to, before its newline
+        line = sum(islice(self.line_counts, 0, self.streaming - self.first + 1))
+        self.textbox.mark_set(STREAM_MARK, f"{line}.end")
+        # Text inserted at the mark moves it along, so the next part goes after it
+        self.textbox.mark_gravity(STREAM_MARK, "right")
+
+    def set_messages(self, texts):
+        """Replace the transcript, showing the end of it"""
+        self.messages = list(texts)
+        self.streaming = None
+        self.first = self.last = max(0, len(self.messages) - self.max_rendered)
+        self.line_counts.clear()
+        self.rendered_lines = 0
+        self.following = True
+        self.edit(lambda: self.textbox.delete("1.0", "end"))
+        self.render_bottom(self.messages[self.first:])
+        self.textbox.see("end")
+
+    def clear(self):
+        self.set_messages([])
+
+    def render_bottom(self, texts):
+        if not texts:
+            return
+        self.edit(lambda: self.textbox.insert("end-1c", "".join(texts)))
+        for text in texts:
+            lines = text.count("\n")
+            self.line_counts.append(lines)
+            self.rendered_lines += lines
+        self.last += len(texts)
+        self.place_stream_mark()
+
+    def render_top(self, texts):
+        if not texts:
+            return 0
+        self.edit(lambda: self.textbox.insert("1.0", "".join(texts)))
+        inserted = 0
+        for text in reversed(texts):
+            lines = text.count("\n")
+            self.line_counts.appendleft(lines)
+            inserted += lines
+        self.rendered_lines += inserted
+        self.first -= len(texts)
+        self.place_stream_mark()
+        return inserted
+
+    def drop_top(self):
+        lines = self.line_counts.popleft()
+        self.edit(lambda: self.textbox.delete("1.0", f"{lines + 1}.0"))
+        self.rendered_lines -= lines
+        self.first += 1
+        return lines
+
+    def drop_bottom(self):
+        lines = self.line_counts.pop()
+        start = self.rendered_lines - lines + 1
+        self.edit(lambda: self.textbox.delete(f"{start}.0", "end-1c"))
+        self.rendered_lines -= lines
+        self.last -= 1
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        at_top = float(first) <= 0.0
+        at_bottom = float(last) >= 1.0
+        self.following = at_bottom and self.last == len(self.messages)
+        if (at_top or (at_bottom and not self.following)) and not self.paging_scheduled:
+            self.paging_scheduled = True
+            self.textbox.after_idle(lambda: self.page_in(at_top))
+
+    def page_in(self, at_top):
+        self.paging_scheduled = False
+        top_line = int(self.textbox.index("@0,0").split(".")[0])
+        if at_top:
+            if self.first == 0 and self.load_older is not None:
+                older = self.load_older()
+                if older:
+                    self.messages[:0] = older
+                    self.first += len(older)
+                    self.last += len(older)
+                    if self.streaming is not None:
+                        self.streaming += len(older)
+            if self.first == 0:
+                return
+            start = max(0, self.first - self.page)
+            top_line += self.render_top(self.messages[start:self.first])
+            while len(self.line_counts) > self.max_rendered:
+                self.drop_bottom()
+        else:
+            if self.last == len(self.messages):
+                return
+            self.render_bottom(self.messages[self.last:self.last + self.page])
+            while len(self.line_counts) > self.max_rendered:
+                top_line -= self.drop_top()
+        # Keep the same message at the top of the view instead of jumping
+        self.textbox.yview(f"{max(1, top_line)}.0")
+
+    def edit(self, change):
+        self.textbox.configure(state="normal")
+        change()
+        self.textbox.configure(state="disabled")
@@ -0,0 +1,282 @@
+import functools
+import time
+
+from context_window import ContextWindow
+from ollama_client import OllamaClient
+from response_cache import is_deterministic, make_key
+
+# Context window sent to Ollama and the share of it the conversation history may use;
+# older turns are summarized in the background once the history nears the budget
+NUM_CTX = 4096
+CONTEXT_TOKEN_BUDGET = 3072
+
+CHAT_TEMPLATE = """
+Answer the question below.
+Here is the conversation history:
+{context}
+Question: {question}
+Answer:
+"""
+
+
+class ChatEngine:
+    """Chat logic shared by the GUI and the headless batch mode.
+
+    Holds the conversation history for interactive use; `complete` runs a
+    single stateless prompt and is safe to call from several threads.
+    """
+
+    def __init__(self, client=None, num_ctx=NUM_CTX, budget_tokens=CONTEXT_TOKEN_BUDGET, cache=None,
+                 semantic_cache=None, metrics=None, residency=None, catalog=None, scheduler=None):
+        self.client = client or OllamaClient()
+        self.num_ctx = num_ctx
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        self.metrics = metrics
+        self.residency = residency
+        self.catalog = catalog
+        # Generation slots shared with the other sessions, also taken by history summaries
+        self.scheduler = scheduler
+        self.use_semantic_cache = False
+        self.sampling_options = {}
+        self.model = None
+        self.chains = {}
+        self.digests = {}
+        self.conversation = ContextWindow(budget_tokens=budget_tokens, summarizer=self.summarize_history)
+
+    def options(self, extra=None):
+        return {"num_ctx": self.num_ctx, **self.sampling_options, **(extra or {})}
+
+    def keep_alive(self, model_name):
+        """How long Ollama should keep the model loaded after this request (None: server default)"""
+        return self.residency.keep_alive(model_name) if self.residency is not None else None
+
+    def get_chain(self, model_name):
+        """Return the prompt | model chain for a model, built once and reused across messages"""
+        keep_alive = self.keep_alive(model_name)
+        key = (model_name, tuple(sorted(self.sampling_options.items())), keep_alive)
+        chain = self.chains.get(key)
+        if chain is None:
+            # LangChain is only used by the text-history mode and takes over a second to import
+            from langchain_core.prompts import ChatPromptTemplate
+            from langchain_ollama import OllamaLLM
+
+            # LangChain talks to one server itself: behind a router this is the first node,
+            # so the text-history mode gets neither routing nor failover
+            model = OllamaLLM(model=model_name, num_ctx=self.num_ctx, base_url=self.client.base_url,
+                              keep_alive=keep_alive, **self.sampling_options)
+            chain = ChatPromptTemplate.from_template(CHAT_TEMPLATE) | model
+            self.chains[key] = chain
+        return chain
+
+    def forget_model(self, model_name):
+        self.chains = {key: chain for key, chain in self.chains.items() if key[0] != model_name}
+        self.digests.pop(model_name, None)
+
+    def model_digest(self, model_name):
+        if self.catalog is not None:
+            try:
+                return self.catalog.digest(model_name)
+            except Exception:
+                return None
+        digest = self.digests.get(model_name)
+        if digest is None:
+            try:
+                self.digests = {model["name"]: model.get("digest") for model in self.client.list_models()}
+            except Exception:
+                return None
+            digest = self.digests.get(model_name)
+        return digest
+
+    def cache_key(self, model_name, options, prompt):
+        """Key for the response cache, or None when the request must not be cached"""
+        if self.cache is None or not is_deterministic(options):
+            return None
+        digest = self.model_digest(model_name)
+        if digest is None:
+            return None
+        return make_key(digest, options, prompt)
+
+    def cached_response(self, key, stats):
+        response = self.cache.get(key) if key else None
+        if response is not None:
+            stats["cache_hit"] = True
+        return response
+
+    def semantic_lookup(self, model_name, question, stats):
+        """Embed the question and look for a near-duplicate; returns (response, embedding)"""
+        if self.semantic_cache is None or not self.use_semantic_cache:
+            return None, None
+        try:
+            embedding = self.client.embed(self.semantic_cache.embed_model, question)
+        except Exception as e:
+            print(f"Semantic cache unavailable: {e}")
+            return None, None
+        match = self.semantic_cache.lookup(model_name, embedding)
+        if match is None:
+            return None, embedding
+        stats["cache_hit"] = True
+        stats["similarity"] = match[1]
+        return match[0], embedding
+
+    def iter_reply(self, message, model_name, chat_mode=True, stream=True, stats=None, cancel=None, compact=True):
+        """Yield the answer to `message` and add the turn to the history once it completes.
+
+        In chat mode the history is sent to /api/chat as the same message list every
+        turn, so the rendered prompt keeps a stable prefix and Ollama only has to
+        prefill the new turn. Otherwise the history is rendered into CHAT_TEMPLATE.
+        `stats` receives the server timings plus client-side ttft_s and latency_s.
+
+        Cancelling `cancel` (a Cancellation) closes the stream so the server stops
+        generating. The partial answer stays in the history (unless the history was
+        cleared in the meantime, like every answer) but is neither cached
+        nor recorded in the metrics, and stats["cancelled"] is set.
+
+        With `compact` the history is summarized in the background once it nears
+        its budget; a caller with more messages queued passes False and calls
+        conversation.maybe_compact() when it is idle.
+        """
+        self.model = model_name
+        if self.residency is not None:
+            self.residency.touch(model_name, self)
+        stats = {} if stats is None else stats
+        start_time = time.perf_counter()
+        # An answer that finishes after the history was cleared does not belong in the new one
+        generation = self.conversation.generation
+        options = self.options()
+        if chat_mode:
+            messages = self.conversation.messages(message)
+            key = self.cache_key(model_name, options, messages)
+        else:
+            inputs = {"context": self.conversation.as_text(message), "question": message}
+            key = self.cache_key(model_name, options, CHAT_TEMPLATE.format(**inputs))
+
+        cached = self.cached_response(key, stats)
+        embedding = None
+        if cached is None and not self.conversation.turns:
+            # Only a question without earlier turns means the same thing on its own
+            cached, embedding = self.semantic_lookup(model_name, message, stats)
+        if cached is not None:
+            chunks = [cached]
+        elif chat_mode:
+            # A single JSON answer only arrives once it is complete, so a cancellable request always streams
+            chunks = self.client.chat(model_name, messages, stats, stream or cancel is not None, options=options,
+                                      keep_alive=self.keep_alive(model_name), cancel=cancel)
+        else:
+            chain = self.get_chain(model_name)
+            config = {"callbacks": [server_stats_class()(stats)]}
+            # invoke() only returns once the answer is complete, so a cancellable request streams here too
+            if stream or cancel is not None:
+                chunks = chain.stream(inputs, config=config)
+            else:
+                chunks = [str(chain.invoke(inputs, config=config))]
+
+        parts = []
+        for chunk in chunks:
+            if cancel is not None and cancel.is_set():
+                break
+            if not chunk:
+                continue
+            if not parts:
+                stats["ttft_s"] = time.perf_counter() - start_time
+            parts.append(chunk)
+            yield chunk
+        stats["latency_s"] = time.perf_counter() - start_time
+        response = "".join(parts)
+        if cancel is not None and cancel.is_set():
+            stats["cancelled"] = True
+            # Ends a LangChain stream, which cannot be closed from another thread
+            if hasattr(chunks, "close"):
+                chunks.close()
+            if not response:
+                return
+        else:
+            if self.metrics is not None:
+                self.metrics.record(model_name, stats, kind="chat")
+            if key and cached is None:
+                self.cache.put(key, response)
+            if embedding is not None and cached is None:
+                self.semantic_cache.add(model_name, message, embedding, response)
+        if self.conversation.add_exchange(message, response, generation) and compact:
+            self.conversation.maybe_compact()
+
+    def iter_complete(self, prompt, model_name, system=None, options=None, stats=None):
+        """Stream the answer to a single prompt without touching the conversation history.
+
+        `stats` receives the server timings plus the client-side ttft_s and latency_s.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        stats = {} if stats is None else stats
+        start_time = time.perf_counter()
+        options = self.options(options)
+        key = self.cache_key(model_name, options, messages)
+        cached = self.cached_response(key, stats)
+        if cached is not None:
+            chunks = [cached]
+        else:
+            chunks = self.client.chat(model_name, messages, stats, options=options,
+                                      keep_alive=self.keep_alive(model_name))
+
+        parts = []
+        for chunk in chunks:
+            if not parts:
+                stats["ttft_s"] = time.perf_counter() - start_time
+            parts.append(chunk)
+            yield chunk
+        stats["latency_s"] = time.perf_counter() - start_time
+        if self.metrics is not None:
+            self.metrics.record(model_name, stats, kind="complete")
+        if key and cached is None:
+            self.cache.put(key, "".join(parts))
+
+    def complete(self, prompt, model_name, system=None, options=None):
+        """Answer a single prompt; returns (text, stats). Safe to call from several threads."""
+        stats = {}
+        text = "".join(self.iter_complete(prompt, model_name, system, options, stats))
+        return text, stats
+
+    def clear(self):
+        self.conversation.clear()
+
+    def summarize_history(self, summary, messages):
+        """Fold older turns into the running summary (runs on a background thread)"""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = (
+            "Summarize the conversation below in a few sentences, keeping names, facts, "
+            "decisions and open questions needed to continue it.\n"
+        )
+        if summary:
+            prompt += f"Summary so far:\n{summary}\n"
+        prompt += f"Conversation:\n{transcript}"
+        model_name = self.model
+        if self.scheduler is not None:
+            # Behind every answer waiting for a slot
+            self.scheduler.acquire(model_name, background=True)
+        try:
+            text, _ = self.complete(prompt, model_name)
+        finally:
+            if self.scheduler is not None:
+                self.scheduler.release(model_name)
+        return text
+
+
+@functools.lru_cache(maxsize=None)
+def server_stats_class():
+    """LangChain callback class, defined on first use so LangChain is imported lazily"""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class ServerStats(BaseCallbackHandler):
+        """Copies Ollama's timing and token counts from a LangChain generation into `stats`"""
+
+        def __init__(self, stats):
+            self.stats = stats
+
+        def on_llm_end(self, response, **kwargs):
+            for generations in response.generations:
+                for generation in generations:
+                    info = generation.generation_info or {}
+                    self.stats.update({k: v for k, v in info.items() if k.endswith(("_count", "_duration"))})
+
+    return ServerStats
@@ -0,0 +1,194 @@
+import time
+from datetime import datetime
+
+from chat_display import ChatDisplay
+from conversation_store import PAGE_SIZE
+from request_queue import RequestQueue
+
+
+class ChatSession:
+    """One chat tab: its display, stored conversation, model and context, and request queue.
+
+    Sessions share the app's client, caches, metrics and generation
+    scheduler; everything a conversation builds up (the history sent to the
+    model, the selected model, queued messages) is per session, so
+    switching tabs never clears or re-sends another conversation's context.
+    """
+
+    def __init__(self, app, parent, title, engine):
+        self.app = app
+        self.title = title
+        self.engine = engine
+        self.model = None
+        self.session_id = None
+        self.oldest_message_id = None
+        self.has_older_messages = False
+        # Set when the tab is closed; its worker may still be finishing an answer
+        self.closed = False
+        # Only a window of recent messages is kept in the widget; scrolling up renders
+        # earlier ones from memory and then from the conversation store
+        self.display = ChatDisplay(parent, load_older=self.load_older_messages)
+        # Messages sent while an answer is generating wait here and are answered in order;
+        # the history is summarized once none is waiting, so a summary never delays an answer
+        self.requests = RequestQueue(self.process_message, on_change=app.queue_changed, scheduler=app.scheduler,
+                                     on_idle=engine.conversation.maybe_compact)
+
+    def conversation_token(self):
+        """Changes whenever the tab is cleared or shows another stored session"""
+        return self.session_id, self.engine.conversation.generation
+
+    def is_current(self, token):
+        if self.closed:
+            return False
+        return token is None or token == self.conversation_token()
+
+    def add_message(self, sender, message, token=None):
+        """Show a message; with a `token`, only if the conversation it belongs to is still shown"""
+        if self.closed:
+            return
+        timestamp = datetime.now().strftime("%H:%M")
+        self.app.ui.batch(self.show_messages, (token, f"[{timestamp}] {sender}: {message}\n"))
+
+    def show_messages(self, items):
+        texts = [text for token, text in items if self.is_current(token)]
+        if texts:
+            self.display.append_many(texts)
+
+    def begin_stream_message(self, sender, token):
+        timestamp = datetime.now().strftime("%H:%M")
+        self.app.ui.call(lambda: self.is_current(token) and self.display.begin_stream(f"[{timestamp}] {sender}: "))
+
+    def append_stream_text(self, text, token):
+        """Queue streamed text; everything that arrived within a frame is inserted at once"""
+        self.app.ui.batch(self.write_stream_text, (token, text))
+
+    def write_stream_text(self, items):
+        if self.closed:
+            return
+        text = "".join(text for token, text in items if self.is_current(token))
+        if text:
+            self.display.extend_last(text)
+
+    def end_stream_message(self, token):
+        self.app.ui.call(lambda: self.is_current(token) and self.display.end_stream())
+
+    def update_status(self, status):
+        if self.closed:
+            return
+        self.app.update_status(status, self)
+
+    def record_message(self, role, sender, content):
+        """Append a chat message to the store, starting a new session if needed"""
+        if self.session_id is None:
+            self.session_id = self.app.store.create_session()
+        self.app.store.append(self.session_id, role, sender, content)
+
+    def open_session(self, session_id):
+        """Show the last page of a stored session and rebuild the model's context from it"""
+        self.requests.cancel_all()
+        messages = self.app.store.page(session_id)
+        self.session_id = session_id
+        self.oldest_message_id = messages[0]["id"] if messages else None
+        self.has_older_messages = len(messages) == PAGE_SIZE
+
+        self.engine.clear()
+        for message in messages:
+            if message["role"] in ("user", "assistant"):
+                self.engine.conversation.add(message["role"], message["content"])
+
+        self.display.set_messages(format_stored_message(m) for m in messages)
+
+    def load_older_messages(self):
+        """Formatted messages from the page before the oldest one shown, called by the chat display"""
+        if not self.has_older_messages or self.session_id is None:
+            return []
+        messages = self.app.store.page(self.session_id, before_id=self.oldest_message_id)
+        self.has_older_messages = len(messages) == PAGE_SIZE
+        if messages:
+            self.oldest_message_id = messages[0]["id"]
+        return [format_stored_message(m) for m in messages]
+
+    def clear(self):
+        self.requests.cancel_all()
+        self.display.clear()
+        self.engine.clear()
+        self.session_id = None
+        self.oldest_message_id = None
+        self.has_older_messages = False
+
+    def send(self, message, settings):
+        """Show and store `message` and queue it for an answer from this session's model"""
+        self.add_message("You", message)
+        self.record_message("user", "You", message)
+        self.requests.submit(message, self.model, settings)
+
+    def record_reply(self, token, sender, content):
+        """Store an answer unless its conversation was cleared or replaced; runs on the Tk thread"""
+        if self.is_current(token):
+            self.record_message("assistant", sender, content)
+
+    def process_message(self, request):
+        """Answer one queued message; runs on the request queue's worker thread"""
+        # Output of this request is dropped once the tab is cleared or shows another session
+        token = self.conversation_token()
+        model_name = request.model_name
+        if request.cancel.is_set():
+            self.add_message("System", "Stopped before the answer started.", token)
+            return
+        settings = request.settings
+        self.engine.sampling_options = settings["sampling_options"]
+        self.engine.use_semantic_cache = settings["semantic_cache"]
+        try:
+            stats = {"queue_wait_s": request.wait_s()}
+            chunks = self.engine.iter_reply(request.message, model_name, settings["chat_mode"],
+                                            settings["stream"], stats, cancel=request.cancel, compact=False)
+            sender = f"Bot ({model_name})"
+            if settings["stream"]:
+                bot_response = self.stream_response(chunks, model_name, token)
+            else:
+                bot_response = "".join(chunks)
+                if bot_response or not stats.get("cancelled"):
+                    self.add_message(sender, bot_response, token)
+            if bot_response or not stats.get("cancelled"):
+                self.app.ui.call(lambda: self.record_reply(token, sender, bot_response))
+            if stats.get("cancelled"):
+                self.update_status(f"{model_name}: stopped after {stats['latency_s']:.2f}s")
+                self.add_message("System", "Generation stopped.", token)
+            else:
+                self.app.show_reply_stats(self, model_name, stats)
+        except Exception as e:
+            self.add_message("System", f"Error: {str(e)}", token)
+
+    def stream_response(self, chunks, model_name, token):
+        """Stream the answer into the chat display and return the full text"""
+        parts = []
+        start_time = time.perf_counter()
+        try:
+            for chunk in chunks:
+                if not parts:
+                    ttft = time.perf_counter() - start_time
+                    self.update_status(f"{model_name}: first token in {ttft:.2f}s")
+                    self.begin_stream_message(f"Bot ({model_name})", token)
+                parts.append(chunk)
+                self.append_stream_text(chunk, token)
+        finally:
+            if parts:
+                self.end_stream_message(token)
+        if not parts:
+            self.add_message(f"Bot ({model_name})", "", token)
+        return "".join(parts)
+
+    def stop(self):
+        return self.requests.cancel_current()
+
+    def close(self):
+        """Stop the tab's requests; anything its worker still reports is dropped"""
+        self.closed = True
+        self.requests.cancel_all()
+        if self.engine.residency is not None:
+            self.engine.residency.end_session(self.engine)
+
+
+def format_stored_message(message):
+    timestamp = datetime.fromtimestamp(message["created_at"]).strftime("%H:%M")
+    return f"[{timestamp}] {message['sender']}: {message['content']}\n"
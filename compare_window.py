@@ -0,0 +1,175 @@
+import customtkinter as ctk
+
+from ollama_client import Cancellation
+
+
+class CompareColumn:
+    """One model's answer: a streaming textbox and a stats line, updated through the UI dispatcher"""
+
+    def __init__(self, parent, ui, model_name, column):
+        self.ui = ui
+        self.model_name = model_name
+        # Set when the window closes, so updates still queued skip the destroyed widgets
+        self.closed = False
+
+        parent.grid_columnconfigure(column, weight=1, uniform="compare")
+        header = ctk.CTkLabel(parent, text=model_name, anchor="w", font=ctk.CTkFont(weight="bold"))
+        header.grid(row=0, column=column, padx=5, pady=(5, 0), sticky="w")
+        self.textbox = ctk.CTkTextbox(parent, wrap="word")
+        self.textbox.grid(row=1, column=column, padx=5, pady=5, sticky="nsew")
+        self.textbox.configure(state="disabled")
+        self.stats_label = ctk.CTkLabel(parent, text="Waiting for a free slot...", anchor="w", justify="left")
+        self.stats_label.grid(row=2, column=column, padx=5, pady=(0, 5), sticky="w")
+
+    def append(self, text):
+        # Tokens arriving within one tick are inserted together
+        self.ui.batch(self.write, text)
+
+    def write(self, texts):
+        if self.closed:
+            return
+        self.textbox.configure(state="normal")
+        self.textbox.insert("end", "".join(texts))
+        self.textbox.configure(state="disabled")
+        self.textbox.see("end")
+
+    def set_stats(self, text):
+        self.ui.latest((self, "stats"), lambda: self.closed or self.stats_label.configure(text=text))
+
+
+class CompareWindow:
+    """Sends one prompt to several models and streams each answer into its own column.
+
+    Each answer waits for a slot from the `scheduler` the chat tabs share, so
+    at most OLLAMA_MAX_LOADED_MODELS models run at once, and models that are
+    already loaded ask first, so comparing many models does not make the
+    server swap them in and out of memory. The columns run as "compare"
+    operations on the `io` loop.
+    """
+
+    def __init__(self, parent, engine, models, scheduler, ui, io):
+        self.engine = engine
+        self.scheduler = scheduler
+        self.ui = ui
+        self.io = io
+        self.window = ctk.CTkToplevel(parent)
+        self.window.title("Compare Models")
+        self.window.geometry("1100x650")
+        self.window.grid_columnconfigure(0, weight=1)
+        self.window.grid_rowconfigure(2, weight=1)
+        self.running = 0
+        self.columns = []
+        self.closed = False
+        # Set on close, so columns still waiting for a slot give up
+        self.cancel = Cancellation()
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        self.model_frame = ctk.CTkScrollableFrame(self.window, orientation="horizontal", height=40)
+        self.model_frame.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="ew")
+        self.model_vars = {}
+        for i, name in enumerate(models):
+            var = ctk.BooleanVar(value=i < 2)
+            ctk.CTkCheckBox(self.model_frame, text=name, variable=var).grid(row=0, column=i, padx=5)
+            self.model_vars[name] = var
+
+        self.input_frame = ctk.CTkFrame(self.window)
+        self.input_frame.grid(row=1, column=0, padx=10, pady=5, sticky="ew")
+        self.input_frame.grid_columnconfigure(0, weight=1)
+        self.input_field = ctk.CTkEntry(self.input_frame, placeholder_text="Prompt to send to every selected model...")
+        self.input_field.grid(row=0, column=0, padx=(0, 10), sticky="ew")
+        self.run_button = ctk.CTkButton(
+            self.input_frame,
+            text="Compare",
+            command=self.run,
+            fg_color="#4CAF50",
+            hover_color="#388E3C",
+            text_color="white"
+        )
+        self.run_button.grid(row=0, column=1)
+        self.input_field.bind("<Return>", lambda event: self.run())
+
+        self.columns_frame = None
+
+    def run(self):
+        prompt = self.input_field.get().strip()
+        models = [name for name, var in self.model_vars.items() if var.get()]
+        if not prompt or not models or self.running:
+            return
+
+        if self.columns_frame is not None:
+            for column in self.columns:
+                column.closed = True
+            self.columns_frame.destroy()
+        self.columns_frame = ctk.CTkFrame(self.window)
+        self.columns_frame.grid(row=2, column=0, padx=10, pady=(5, 10), sticky="nsew")
+        self.columns_frame.grid_rowconfigure(1, weight=1)
+        columns = [CompareColumn(self.columns_frame, self.ui, name, i) for i, name in enumerate(models)]
+        self.columns = list(columns)
+
+        self.running = len(columns)
+        self.run_button.configure(state="disabled")
+        self.io.submit("compare", self.start_columns, prompt, columns)
+
+    async def start_columns(self, prompt, columns):
+        try:
+            loaded = set(await self.io.blocking(self.engine.client.running_models))
+        except Exception:
+            loaded = set()
+        # Operations of a kind start in submission order, so the loaded models go first
+        columns.sort(key=lambda column: column.model_name not in loaded)
+        for column in columns:
+            self.io.submit("compare", self.run_column, prompt, column)
+
+    def run_column(self, prompt, column):
+        stats = {}
+        acquired = False
+        try:
+            acquired = self.scheduler.acquire(column.model_name, self.cancel)
+            if not acquired:
+                return
+            column.set_stats("Generating...")
+            chunks = self.engine.iter_complete(prompt, column.model_name, stats=stats)
+            for i, chunk in enumerate(chunks):
+                if self.closed:
+                    # Closing the stream stops the generation on the server
+                    chunks.close()
+                    return
+                if i == 0:
+                    column.set_stats(f"First token: {stats['ttft_s']:.2f}s")
+                column.append(chunk)
+            column.set_stats(format_stats(stats))
+        except Exception as e:
+            if not self.closed:
+                column.set_stats(f"Error: {str(e)}")
+        finally:
+            if acquired:
+                self.scheduler.release(column.model_name)
+            if not self.closed:
+                self.ui.call(self.column_done)
+
+    def on_close(self):
+        self.closed = True
+        self.cancel.cancel()
+        for column in self.columns:
+            column.closed = True
+        self.window.destroy()
+
+    def column_done(self):
+        if self.closed:
+            return
+        self.running -= 1
+        if self.running == 0:
+            self.run_button.configure(state="normal")
+
+
+def format_stats(stats):
+    ttft = stats.get("ttft_s")
+    latency = stats.get("latency_s", 0)
+    if stats.get("eval_duration"):
+        tokens_per_second = stats.get("eval_count", 0) / (stats["eval_duration"] / 1e9)
+    elif ttft is not None and latency > ttft:
+        tokens_per_second = stats.get("eval_count", 0) / (latency - ttft)
+    else:
+        tokens_per_second = 0
+    first_token = f"{ttft:.2f}s" if ttft is not None else "-"
+    return f"First token: {first_token}   {tokens_per_second:.1f} tokens/s   Total: {latency:.2f}s"
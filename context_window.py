@@ -0,0 +1,142 @@
+import os
+import threading
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return max(1, (len(text) + 3) // 4)
+
+
+class Turn:
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role, content, tokens):
+        self.role = role
+        self.content = content
+        self.tokens = tokens
+
+    def as_message(self):
+        return {"role": self.role, "content": self.content}
+
+
+class ContextWindow:
+    """Conversation history kept within a token budget.
+
+    Each turn is counted once when it is added. When the history reaches
+    `compact_ratio` of the budget, the older turns are folded into a running
+    summary by a low-priority background thread, and prompts are built from
+    the summary plus the most recent turns.
+    """
+
+    def __init__(self, budget_tokens=3072, keep_recent=6, compact_ratio=0.8,
+                 summarizer=None, token_counter=estimate_tokens):
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.compact_ratio = compact_ratio
+        self.summarizer = summarizer
+        self.token_counter = token_counter
+        self.lock = threading.Lock()
+        self.turns = []
+        self.summary = ""
+        self.summary_tokens = 0
+        self.total_tokens = 0
+        self.generation = 0
+        self.compacting = False
+
+    def add(self, role, content):
+        turn = Turn(role, content, self.token_counter(content))
+        with self.lock:
+            self.turns.append(turn)
+            self.total_tokens += turn.tokens
+        return turn
+
+    def add_exchange(self, question, answer, generation):
+        """Add a question and its answer unless the history was cleared since `generation` was read"""
+        with self.lock:
+            if generation != self.generation:
+                return False
+            for role, content in (("user", question), ("assistant", answer)):
+                turn = Turn(role, content, self.token_counter(content))
+                self.turns.append(turn)
+                self.total_tokens += turn.tokens
+        return True
+
+    def clear(self):
+        with self.lock:
+            self.turns = []
+            self.summary = ""
+            self.summary_tokens = 0
+            self.total_tokens = 0
+            self.generation += 1
+
+    def messages(self, pending=None):
+        """Return chat messages for the next request, dropping the oldest turns that do not fit"""
+        with self.lock:
+            budget = self.budget_tokens - self.summary_tokens
+            if pending is not None:
+                budget -= self.token_counter(pending)
+            recent = []
+            for turn in reversed(self.turns):
+                if recent and budget - turn.tokens < 0:
+                    break
+                budget -= turn.tokens
+                recent.append(turn.as_message())
+            recent.reverse()
+            summary = self.summary
+
+        if summary:
+            recent.insert(0, {"role": "system",
+                              "content": f"Summary of the earlier conversation:\n{summary}"})
+        if pending is not None:
+            recent.append({"role": "user", "content": pending})
+        return recent
+
+    def as_text(self, pending=None):
+        """Render the history for the plain-text prompt template"""
+        messages = self.messages(pending)
+        if pending is not None:
+            messages = messages[:-1]
+        labels = {"user": "User: ", "assistant": "AI: ", "system": ""}
+        return "".join(f"\n{labels[m['role']]}{m['content']}" for m in messages)
+
+    def maybe_compact(self):
+        """Start a background summary of older turns once the budget is nearly used"""
+        with self.lock:
+            if (self.compacting or self.summarizer is None
+                    or self.total_tokens < self.budget_tokens * self.compact_ratio
+                    or len(self.turns) <= self.keep_recent):
+                return False
+            self.compacting = True
+            old_turns = self.turns[:-self.keep_recent]
+            summary = self.summary
+            generation = self.generation
+
+        threading.Thread(target=self._compact, args=(summary, old_turns, generation), daemon=True).start()
+        return True
+
+    def _compact(self, summary, old_turns, generation):
+        lower_thread_priority()
+        try:
+            new_summary = self.summarizer(summary, [turn.as_message() for turn in old_turns])
+        except Exception as e:
+            print(f"Error summarizing conversation: {e}")
+            new_summary = None
+
+        with self.lock:
+            self.compacting = False
+            if not new_summary or generation != self.generation:
+                return
+            if self.turns[:len(old_turns)] != old_turns:
+                return
+            self.turns = self.turns[len(old_turns):]
+            self.summary = new_summary.strip()
+            self.summary_tokens = self.token_counter(self.summary)
+            self.total_tokens = self.summary_tokens + sum(turn.tokens for turn in self.turns)
+
+
+def lower_thread_priority():
+    # On Linux a thread has its own nice value, elsewhere this is a no-op
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+import time
+
+PAGE_SIZE = 50
+
+
+class ConversationStore:
+    """SQLite store of chat sessions and their messages.
+
+    Messages are written one at a time as they are sent or received and are
+    never updated or deleted; clearing the chat starts a new session instead.
+    The only update is a session's title, set once from its first user message.
+    Pages are read newest-first by message id, so opening a long session only
+    touches the rows that are shown.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, created_at REAL NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER NOT NULL REFERENCES sessions(id), "
+            "role TEXT NOT NULL, sender TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+        self.db.commit()
+
+    def create_session(self, title=None):
+        with self.lock:
+            cursor = self.db.execute("INSERT INTO sessions (title, created_at) VALUES (?, ?)",
+                                     (title, time.time()))
+            self.db.commit()
+            return cursor.lastrowid
+
+    def append(self, session_id, role, sender, content):
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT INTO messages (session_id, role, sender, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, role, sender, content, time.time())
+            )
+            if role == "user":
+                self.db.execute("UPDATE sessions SET title = ? WHERE id = ? AND title IS NULL",
+                                (content[:60], session_id))
+            self.db.commit()
+            return cursor.lastrowid
+
+    def page(self, session_id, before_id=None, limit=PAGE_SIZE):
+        """Return up to `limit` messages older than `before_id`, oldest first"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, role, sender, content, created_at FROM messages "
+                "WHERE session_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (session_id, before_id if before_id is not None else 2 ** 62, limit)
+            ).fetchall()
+        rows.reverse()
+        return [dict(zip(("id", "role", "sender", "content", "created_at"), row)) for row in rows]
+
+    def sessions(self, limit=50):
+        """Most recently active sessions first, with their message counts"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT s.id, s.title, s.created_at, COUNT(m.id), MAX(m.created_at) "
+                "FROM sessions s JOIN messages m ON m.session_id = s.id "
+                "GROUP BY s.id ORDER BY MAX(m.id) DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(zip(("id", "title", "created_at", "messages", "updated_at"), row)) for row in rows]
+
+    def latest_session(self):
+        with self.lock:
+            row = self.db.execute("SELECT session_id FROM messages ORDER BY id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
@@ -0,0 +1,286 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import requests
+
+from ollama_client import Cancellation, OllamaError
+
+# Pulls that run at the same time; the rest wait in the queue
+DEFAULT_CONCURRENCY = 2
+# Seconds of progress the transfer rate is averaged over
+RATE_WINDOW = 5.0
+# Minimum seconds between progress notifications for one pull; state changes are always sent
+NOTIFY_INTERVAL = 0.25
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+# Status text for the steps after the layers are downloaded
+PHASES = (
+    (("verifying", "validating"), "Verifying"),
+    (("writing", "finalizing"), "Finalizing"),
+)
+
+
+def download_concurrency():
+    """Parallel pulls from CHATBOT_DOWNLOAD_CONCURRENCY, 2 by default"""
+    try:
+        return max(1, int(os.environ.get("CHATBOT_DOWNLOAD_CONCURRENCY", DEFAULT_CONCURRENCY)))
+    except ValueError:
+        return DEFAULT_CONCURRENCY
+
+
+class Download:
+    """One model pull: its state, bytes per layer and recent transfer rate"""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.state = QUEUED
+        self.status = "Queued"
+        self.error = None
+        self.layers = {}
+        self.samples = deque()
+        self.cancel = Cancellation()
+        self.finished = threading.Event()
+        self.last_notify = 0.0
+
+    @property
+    def completed(self):
+        return sum(completed for completed, _ in self.layers.values())
+
+    @property
+    def total(self):
+        return sum(total for _, total in self.layers.values())
+
+    def update(self, data):
+        """Apply one /api/pull progress line; returns True when the pull reported success"""
+        status = data.get("status", "")
+        if status == "success":
+            return True
+        digest = data.get("digest")
+        if digest and data.get("total"):
+            self.layers[digest] = (data.get("completed", 0), data["total"])
+            now = time.monotonic()
+            self.samples.append((now, self.completed))
+            while len(self.samples) > 2 and now - self.samples[0][0] > RATE_WINDOW:
+                self.samples.popleft()
+            self.status = "Downloading"
+            return False
+        lowered = status.lower()
+        for words, label in PHASES:
+            if any(word in lowered for word in words):
+                self.status = label
+                break
+        else:
+            if status:
+                self.status = status[:1].upper() + status[1:]
+        return False
+
+    def rate(self):
+        """Bytes per second over the last RATE_WINDOW seconds of progress"""
+        if self.state != RUNNING or len(self.samples) < 2:
+            return 0.0
+        (start, first), (end, last) = self.samples[0], self.samples[-1]
+        return (last - first) / (end - start) if end > start else 0.0
+
+    def snapshot(self):
+        rate = self.rate()
+        remaining = self.total - self.completed
+        return {
+            "model": self.model_name,
+            "state": self.state,
+            "status": self.status,
+            "error": self.error,
+            "completed": self.completed,
+            "total": self.total,
+            "fraction": self.completed / self.total if self.total else 0.0,
+            "bytes_per_s": rate,
+            "eta_s": remaining / rate if rate > 0 and remaining > 0 else None,
+        }
+
+
+class DownloadManager:
+    """Queue of model pulls through /api/pull, `concurrency` of them at a time.
+
+    Every pull reports per-layer byte counts, from which each pull's and the
+    overall transfer rate and time left are computed. Cancelling a running
+    pull closes its stream, which stops it on the server. The names of
+    unfinished pulls are kept in `state_path`; Ollama keeps the layers it
+    already has, so pulling them again after a restart (`resume`) continues
+    where they stopped.
+
+    `on_update` is called from worker threads when the progress changes,
+    `on_finish` with the Download when a pull ends: on the `io` IOLoop when
+    one is given, else on the thread that ended it.
+    """
+
+    def __init__(self, client, concurrency=None, state_path=None, on_update=None, on_finish=None, io=None):
+        self.client = client
+        self.io = io
+        self.concurrency = concurrency or download_concurrency()
+        self.state_path = state_path
+        self.on_update = on_update
+        self.on_finish = on_finish
+        self.lock = threading.Lock()
+        self.state_lock = threading.Lock()
+        self.pending = queue.Queue()
+        self.downloads = {}
+        self.workers = []
+
+    def start(self):
+        for _ in range(self.concurrency):
+            worker = threading.Thread(target=self.work, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def enqueue(self, model_name):
+        """Queue a pull; a model that is already queued or downloading keeps its current pull"""
+        with self.lock:
+            download = self.downloads.get(model_name)
+            if download is not None and download.state in ACTIVE:
+                return download
+            download = Download(model_name)
+            self.downloads[model_name] = download
+        self.pending.put(download)
+        self.save_state()
+        self.notify(download, force=True)
+        return download
+
+    def resume(self):
+        """Queue the pulls that were unfinished when the app last closed; returns their names"""
+        names = self.load_state()
+        for name in names:
+            self.enqueue(name)
+        return names
+
+    def cancel(self, model_name):
+        with self.lock:
+            download = self.downloads.get(model_name)
+            if download is None or download.state not in ACTIVE:
+                return False
+            queued = download.state == QUEUED
+            if queued:
+                # The worker that dequeues it skips it
+                self.finish(download, CANCELLED)
+        if queued:
+            self.report(download)
+        # Closing the stream unblocks the worker reading it and stops the pull on the server
+        download.cancel.cancel()
+        return True
+
+    def work(self):
+        while True:
+            download = self.pending.get()
+            with self.lock:
+                if download.cancel.is_set() or download.state != QUEUED:
+                    continue
+                download.state = RUNNING
+                download.status = "Starting"
+            self.notify(download, force=True)
+            self.pull(download)
+
+    def pull(self, download):
+        succeeded = False
+        error = None
+        try:
+            for data in self.client.pull(download.model_name, cancel=download.cancel):
+                with self.lock:
+                    succeeded = download.update(data)
+                if succeeded:
+                    break
+                self.notify(download)
+        except OllamaError as e:
+            error = str(e)
+        except requests.exceptions.RequestException as e:
+            error = f"Connection error: {e}"
+        except ValueError as e:
+            error = f"Invalid response from Ollama: {e}"
+        except Exception as e:
+            # Anything else must still end the pull, or its worker and slot would be lost
+            error = f"Unexpected error: {e}"
+        with self.lock:
+            if download.cancel.is_set():
+                state = CANCELLED
+            elif succeeded:
+                state = DONE
+            else:
+                state = FAILED
+                download.error = error or "The pull ended before it completed"
+            self.finish(download, state)
+        self.report(download)
+
+    def finish(self, download, state):
+        # Called with self.lock held
+        download.state = state
+        download.status = {DONE: "Complete", FAILED: "Failed", CANCELLED: "Cancelled"}[state]
+        download.finished.set()
+
+    def report(self, download):
+        """Save the state and announce the ended pull, outside self.lock"""
+        if self.io is not None:
+            self.io.submit("downloads", self.finished, download)
+        else:
+            self.finished(download)
+
+    def finished(self, download):
+        self.save_state()
+        self.notify(download, force=True)
+        if self.on_finish is not None:
+            self.on_finish(download)
+
+    def notify(self, download, force=False):
+        if self.on_update is None:
+            return
+        now = time.monotonic()
+        if force or now - download.last_notify >= NOTIFY_INTERVAL:
+            download.last_notify = now
+            self.on_update()
+
+    def snapshot(self):
+        """Active pulls in queue order, plus the combined rate and time left of the running ones"""
+        with self.lock:
+            downloads = [d.snapshot() for d in self.downloads.values() if d.state in ACTIVE]
+        running = [d for d in downloads if d["state"] == RUNNING]
+        rate = sum(d["bytes_per_s"] for d in running)
+        remaining = sum(d["total"] - d["completed"] for d in running)
+        completed = sum(d["completed"] for d in running)
+        total = sum(d["total"] for d in running)
+        return {
+            "downloads": downloads,
+            "running": len(running),
+            "queued": len(downloads) - len(running),
+            "completed": completed,
+            "total": total,
+            "fraction": completed / total if total else 0.0,
+            "bytes_per_s": rate,
+            "eta_s": remaining / rate if rate > 0 and remaining > 0 else None,
+        }
+
+    def active(self):
+        with self.lock:
+            return [name for name, d in self.downloads.items() if d.state in ACTIVE]
+
+    def load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return []
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return list(json.load(f).get("pending", []))
+        except (OSError, ValueError, AttributeError):
+            return []
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        tmp_path = self.state_path + ".tmp"
+        with self.state_lock:
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"pending": self.active()}, f)
+                os.replace(tmp_path, self.state_path)
+            except OSError:
+                pass
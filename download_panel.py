@@ -0,0 +1,115 @@
+import customtkinter as ctk
+
+
+class DownloadPanel:
+    """Progress of the queued and running pulls: one row per model with its
+    own Cancel button, under an overall bar with the combined rate and time left.
+    Hidden while nothing is downloading.
+    """
+
+    def __init__(self, parent, on_cancel):
+        self.on_cancel = on_cancel
+        self.frame = ctk.CTkFrame(parent)
+        self.frame.grid_columnconfigure(0, weight=1)
+        self.total_bar = ctk.CTkProgressBar(self.frame)
+        self.total_bar.grid(row=0, column=0, padx=10, pady=(5, 0), sticky="ew")
+        self.total_bar.set(0)
+        self.total_label = ctk.CTkLabel(self.frame, text="", anchor="w")
+        self.total_label.grid(row=1, column=0, padx=10, pady=(0, 5), sticky="w")
+        self.rows = {}
+        self.visible = True
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+        self.hide()
+
+    def show(self):
+        if not self.visible:
+            self.frame.grid()
+            self.visible = True
+
+    def hide(self):
+        if self.visible:
+            self.frame.grid_remove()
+            self.visible = False
+
+    def refresh(self, snapshot):
+        downloads = snapshot["downloads"]
+        names = [d["model"] for d in downloads]
+        for name in list(self.rows):
+            if name not in names:
+                self.rows.pop(name)["frame"].destroy()
+        if not downloads:
+            self.hide()
+            return
+
+        for index, download in enumerate(downloads):
+            row = self.rows.get(download["model"]) or self.add_row(download["model"])
+            row["frame"].grid(row=index + 2, column=0, columnspan=2, padx=10, pady=(0, 5), sticky="ew")
+            row["bar"].set(download["fraction"])
+            row["label"].configure(text=describe(download))
+
+        self.total_bar.set(snapshot["fraction"])
+        parts = [f"{snapshot['running']} downloading"]
+        if snapshot["queued"]:
+            parts.append(f"{snapshot['queued']} queued")
+        if snapshot["total"]:
+            parts.append(f"{megabytes(snapshot['completed'])} of {megabytes(snapshot['total'])}")
+        if snapshot["bytes_per_s"]:
+            parts.append(f"{rate(snapshot['bytes_per_s'])}, {eta(snapshot['eta_s'])} left")
+        self.total_label.configure(text=", ".join(parts))
+        self.show()
+
+    def add_row(self, model_name):
+        frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        frame.grid_columnconfigure(1, weight=1)
+        ctk.CTkLabel(frame, text=model_name, width=140, anchor="w").grid(row=0, column=0, padx=(0, 5), sticky="w")
+        bar = ctk.CTkProgressBar(frame)
+        bar.grid(row=0, column=1, padx=5, sticky="ew")
+        bar.set(0)
+        label = ctk.CTkLabel(frame, text="", width=260, anchor="w")
+        label.grid(row=0, column=2, padx=5, sticky="w")
+        ctk.CTkButton(
+            frame,
+            text="Cancel",
+            command=lambda: self.on_cancel(model_name),
+            width=70,
+            fg_color="#D32F2F",
+            hover_color="#B71C1C",
+            text_color="white"
+        ).grid(row=0, column=3, padx=(5, 0))
+        row = {"frame": frame, "bar": bar, "label": label}
+        self.rows[model_name] = row
+        return row
+
+
+def describe(download):
+    if download["state"] == "queued":
+        return "Queued"
+    if download["status"] != "Downloading" or not download["total"]:
+        return download["status"]
+    text = f"{download['fraction']:.0%} of {megabytes(download['total'])}"
+    if download["bytes_per_s"]:
+        text += f", {rate(download['bytes_per_s'])}, {eta(download['eta_s'])} left"
+    return text
+
+
+def megabytes(size):
+    if size >= 1024 ** 3:
+        return f"{size / 1024 ** 3:.2f} GB"
+    return f"{size / 1024 ** 2:.0f} MB"
+
+
+def rate(bytes_per_s):
+    return f"{bytes_per_s / 1024 ** 2:.1f} MB/s"
+
+
+def eta(seconds):
+    if seconds is None:
+        return "unknown time"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
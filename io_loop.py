@@ -0,0 +1,151 @@
+import asyncio
+import functools
+import inspect
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+# Operations of each kind that run at once; further ones wait for a free place
+OPERATION_LIMITS = {
+    # Loading, unloading and removing models: one change at a time, so they never interleave
+    "model": 1,
+    "models": 1,
+    "storage": 1,
+    "startup": 1,
+}
+DEFAULT_LIMIT = 2
+# Threads for the blocking calls operations make (the requests-based client, disk scans)
+BLOCKING_WORKERS = 6
+# Kinds whose operations stream for a long time (Compare answers); they run on a pool of
+# their own, so they never take the threads the short calls above need
+STREAMING_KINDS = {"compare"}
+STREAMING_WORKERS = 8
+
+
+class Operation:
+    """A submitted operation; `cancel` drops it if it is waiting and interrupts it at its next await"""
+
+    def __init__(self, kind, key, future):
+        self.kind = kind
+        self.key = key
+        self.future = future
+
+    def cancel(self):
+        return self.future.cancel()
+
+    def cancelled(self):
+        return self.future.cancelled()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+class IOLoop:
+    """One asyncio event loop on a background thread for the app's I/O.
+
+    `submit` runs a coroutine function, or a plain function on a bounded
+    thread pool (a separate one for STREAMING_KINDS), as an operation of
+    some kind; at most OPERATION_LIMITS
+    operations of a kind run at once and the rest wait in submission
+    order. An operation with a `key` is not started twice: submitting the
+    key again returns the operation already queued or running, or with
+    `replace` cancels it first, so the newest request wins. `on_result` and
+    `on_error` run on the Tk thread through the UI dispatcher; a cancelled
+    operation calls neither.
+    """
+
+    def __init__(self, ui=None, limits=None, workers=BLOCKING_WORKERS, streaming_workers=STREAMING_WORKERS):
+        self.ui = ui
+        self.limits = {**OPERATION_LIMITS, **(limits or {})}
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="io")
+        self.streaming = ThreadPoolExecutor(max_workers=streaming_workers, thread_name_prefix="io-stream")
+        self.loop.set_default_executor(self.executor)
+        self.semaphores = {}
+        self.lock = threading.Lock()
+        self.operations = {}
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def stop(self):
+        """Cancel every keyed operation and stop the loop; blocking calls already running finish on their own"""
+        with self.lock:
+            operations = list(self.operations.values())
+        for operation in operations:
+            operation.cancel()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.streaming.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, kind, func, *args, key=None, replace=False, on_result=None, on_error=None):
+        """Run `func(*args)` as an operation of `kind`; safe to call from any thread"""
+        with self.lock:
+            current = self.operations.get(key) if key is not None else None
+            if current is not None and not current.done() and not replace:
+                return current
+            future = asyncio.run_coroutine_threadsafe(self.limited(kind, func, args), self.loop)
+            operation = Operation(kind, key, future)
+            if key is not None:
+                self.operations[key] = operation
+        # Outside the lock: cancelling runs the replaced operation's done callback right here
+        if current is not None and replace:
+            current.cancel()
+        future.add_done_callback(lambda _: self.finished(operation, on_result, on_error))
+        return operation
+
+    async def limited(self, kind, func, args):
+        # Semaphores are only touched on the loop thread, so creating them needs no lock
+        semaphore = self.semaphores.get(kind)
+        if semaphore is None:
+            semaphore = self.semaphores[kind] = asyncio.Semaphore(self.limits.get(kind, DEFAULT_LIMIT))
+        async with semaphore:
+            if inspect.iscoroutinefunction(func):
+                return await func(*args)
+            if kind in STREAMING_KINDS:
+                return await self.run_on(self.streaming, func, *args)
+            return await self.blocking(func, *args)
+
+    async def blocking(self, func, *args, **kwargs):
+        """Await a blocking call on the loop's thread pool, for use inside operations"""
+        return await self.run_on(self.executor, func, *args, **kwargs)
+
+    async def run_on(self, executor, func, *args, **kwargs):
+        future = self.loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The thread cannot be interrupted: keep the operation's place in its limit until the call returns
+            await asyncio.wait([future])
+            raise
+
+    def finished(self, operation, on_result, on_error):
+        with self.lock:
+            if self.operations.get(operation.key) is operation:
+                del self.operations[operation.key]
+        try:
+            result = operation.result()
+        except CancelledError:
+            return
+        except Exception as e:
+            if on_error is not None:
+                self.deliver(on_error, e)
+            else:
+                print(f"{operation.kind} operation failed: {e}")
+            return
+        if on_result is not None:
+            self.deliver(on_result, result)
+
+    def deliver(self, callback, value):
+        if self.ui is None:
+            callback(value)
+        else:
+            self.ui.call(lambda: callback(value))
@@ -1,25 +1,91 @@
-import subprocess
 import time
+
+PROCESS_START = time.perf_counter()
+
+import argparse
+import subprocess
 import sys
 import os
-import re
-import json
-import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from tkinter import messagebox
 import webbrowser
 
 import requests
 import customtkinter as ctk
-from langchain_ollama import OllamaLLM
-from langchain_core.prompts import ChatPromptTemplate
+
+from app_paths import data_path
+from chat_engine import ChatEngine
+from chat_session import ChatSession
+from compare_window import CompareWindow
+from conversation_store import ConversationStore
+from download_manager import DownloadManager, DONE, CANCELLED
+from download_panel import DownloadPanel
+from metrics import default_recorder
+from metrics_window import MetricsWindow
+from model_catalog import ModelCatalog, summary
+from model_residency import ResidencyManager, ram_budget_bytes
+from model_storage import ModelStorage
+from io_loop import STREAMING_WORKERS, IOLoop
+from ollama_client import AsyncOllamaClient, OllamaError, max_loaded_models, num_parallel
+from ollama_router import base_urls, check_nodes, configured_hosts, make_client, node_count
+from ollama_server import OllamaServer
+from request_queue import GenerationScheduler
+from response_cache import ResponseCache
+from startup_timer import StartupTimer
+from ui_dispatcher import UIDispatcher
+
+IMPORTS_DONE = time.perf_counter()
+
+# Answers generated with deterministic sampling are cached on disk, keyed by model digest,
+# options and prompt
+RESPONSE_CACHE_FILE = "response_cache.sqlite3"
+DETERMINISTIC_OPTIONS = {"temperature": 0, "seed": 0}
+
+# Near-duplicate first questions can be answered from earlier responses, matched by the
+# cosine similarity of their /api/embed embeddings
+SEMANTIC_CACHE_DIR = "semantic_cache"
+EMBED_MODEL = os.environ.get("CHATBOT_EMBED_MODEL", "nomic-embed-text")
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# Sessions and messages are appended to this SQLite file as they are sent and received
+CONVERSATION_DB_FILE = "conversations.sqlite3"
+
+# Which models were used and switched between, for preloading the likely next model
+MODEL_USAGE_FILE = "model_usage.json"
+
+# Models still queued or downloading, pulled again at the next start to resume them
+DOWNLOAD_STATE_FILE = "downloads.json"
+
+# Installed models with their /api/show details, shown before the server has answered
+MODEL_CATALOG_FILE = "model_catalog.json"
+
+# Directory listings and parsed manifests of the model store, reused while their mtimes are unchanged
+STORAGE_CACHE_FILE = "storage_cache.json"
+
+# Output of an `ollama serve` started by the app, which may outlive the window
+OLLAMA_LOG_FILE = "ollama_serve.log"
+
+# Upper bound in seconds for unloading the running models when the window closes
+SHUTDOWN_DEADLINE = 3.0
 
 
 class ChatbotGUI:
     def __init__(self):
+        self.startup_timer = StartupTimer(PROCESS_START)
+        self.startup_timer.step("imports", IMPORTS_DONE - PROCESS_START)
+        build_start = time.perf_counter()
         self.window = ctk.CTk()
         self.window.title("AI Chatbot")
         self.window.geometry("920x600")
+        # Updates from worker threads are queued and applied together once per frame
+        self.ui = UIDispatcher(self.window)
+        self.ui.start()
+        # Background work started from the window runs here, with per-kind limits,
+        # and reports back through the dispatcher; Compare may stream as many answers
+        # at once as the servers keep models loaded
+        self.io = IOLoop(self.ui, limits={
+            "compare": min(max_loaded_models() * len(configured_hosts()), STREAMING_WORKERS)}).start()
         self.window.grid_columnconfigure(0, weight=1)
         self.window.grid_rowconfigure(0, weight=1)
 
@@ -28,9 +94,12 @@ class ChatbotGUI:
         self.main_frame.grid_columnconfigure(0, weight=1)
         self.main_frame.grid_rowconfigure(0, weight=1)
 
-        self.chat_display = ctk.CTkTextbox(self.main_frame, wrap="word")
-        self.chat_display.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="nsew", columnspan=3)
-        self.chat_display.configure(state="disabled")
+        # One tab per chat session, each with its own model, context and request queue
+        self.tabview = ctk.CTkTabview(self.main_frame, command=self.on_tab_change)
+        self.tabview.grid(row=0, column=0, padx=10, pady=(0, 5), sticky="nsew", columnspan=3)
+        self.sessions = {}
+        self.active = None
+        self.tabs_opened = 0
 
         # Model selection frame
         self.model_frame = ctk.CTkFrame(self.main_frame)
@@ -109,6 +178,17 @@ class ChatbotGUI:
         )
         self.see_models_button.grid(row=0, column=6, padx=5)
 
+        self.compare_button = ctk.CTkButton(
+            self.model_frame,
+            text="Compare",
+            command=self.open_compare,
+            width=80,
+            fg_color="#2196F3",
+            hover_color="#1976D2",
+            text_color="white"
+        )
+        self.compare_button.grid(row=0, column=7, padx=5)
+
         # Input frame
         self.input_frame = ctk.CTkFrame(self.main_frame)
         self.input_frame.grid(row=2, column=0, padx=10, pady=(5, 10), sticky="ew")
@@ -127,6 +207,18 @@ class ChatbotGUI:
         )
         self.send_button.grid(row=0, column=1)
 
+        self.stop_button = ctk.CTkButton(
+            self.input_frame,
+            text="Stop",
+            command=self.stop_generation,
+            width=60,
+            state="disabled",
+            fg_color="#D32F2F",
+            hover_color="#B71C1C",
+            text_color="white"
+        )
+        self.stop_button.grid(row=0, column=2, padx=(10, 0))
+
         self.clear_button = ctk.CTkButton(
             self.input_frame,
             text="Clear Chat",
@@ -135,97 +227,247 @@ class ChatbotGUI:
             hover_color="#1976D2",
             text_color="white"
         )
-        self.clear_button.grid(row=0, column=2, padx=(10, 0))
+        self.clear_button.grid(row=0, column=3, padx=(10, 0))
 
-        self.status_label = ctk.CTkLabel(self.main_frame, text="Status: Initializing...", anchor="w")
-        self.status_label.grid(row=3, column=0, padx=10, pady=(0, 5), sticky="w")
+        self.history_button = ctk.CTkButton(
+            self.input_frame,
+            text="History",
+            command=self.open_history,
+            width=80,
+            fg_color="#2196F3",
+            hover_color="#1976D2",
+            text_color="white"
+        )
+        self.history_button.grid(row=0, column=4, padx=(10, 0))
 
-        # Download progress frame
-        self.progress_frame = ctk.CTkFrame(self.main_frame)
-        self.progress_frame.grid(row=4, column=0, padx=10, pady=(0, 5), sticky="ew")
-        self.progress_frame.grid_columnconfigure(0, weight=1)
+        self.metrics_button = ctk.CTkButton(
+            self.input_frame,
+            text="Metrics",
+            command=self.open_metrics,
+            width=80,
+            fg_color="#2196F3",
+            hover_color="#1976D2",
+            text_color="white"
+        )
+        self.metrics_button.grid(row=0, column=5, padx=(10, 0))
 
-        self.progress_bar = ctk.CTkProgressBar(self.progress_frame)
-        self.progress_bar.grid(row=0, column=0, padx=10, pady=5, sticky="ew")
-        self.progress_bar.set(0)
+        self.options_frame = ctk.CTkFrame(self.input_frame, fg_color="transparent")
+        self.options_frame.grid(row=1, column=0, columnspan=6, pady=(5, 0), sticky="w")
 
-        self.progress_label = ctk.CTkLabel(self.progress_frame, text="", anchor="w")
-        self.progress_label.grid(row=1, column=0, padx=10, pady=(0, 5), sticky="w")
+        self.stream_var = ctk.BooleanVar(value=True)
+        self.stream_switch = ctk.CTkSwitch(
+            self.options_frame,
+            text="Stream",
+            variable=self.stream_var,
+            width=80
+        )
+        self.stream_switch.grid(row=0, column=0, padx=(0, 10))
+
+        self.chat_mode_var = ctk.BooleanVar(value=True)
+        self.chat_mode_switch = ctk.CTkSwitch(
+            self.options_frame,
+            text="Chat API",
+            variable=self.chat_mode_var,
+            width=80
+        )
+        self.chat_mode_switch.grid(row=0, column=1, padx=(0, 10))
+
+        self.deterministic_var = ctk.BooleanVar(value=False)
+        self.deterministic_switch = ctk.CTkSwitch(
+            self.options_frame,
+            text="Deterministic",
+            variable=self.deterministic_var,
+            width=80
+        )
+        self.deterministic_switch.grid(row=0, column=2, padx=(0, 10))
+
+        self.semantic_cache_var = ctk.BooleanVar(value=False)
+        self.semantic_cache_switch = ctk.CTkSwitch(
+            self.options_frame,
+            text="Similar-question cache",
+            variable=self.semantic_cache_var,
+            width=80
+        )
+        self.semantic_cache_switch.grid(row=0, column=3, padx=(0, 10))
 
-        self.cancel_download_button = ctk.CTkButton(
-            self.progress_frame,
-            text="Cancel",
-            command=self.cancel_download,
-            width=80,
-            fg_color="#D32F2F",
-            hover_color="#B71C1C",
+        self.new_tab_button = ctk.CTkButton(
+            self.options_frame,
+            text="New Tab",
+            command=self.new_tab,
+            width=70,
+            fg_color="#2196F3",
+            hover_color="#1976D2",
+            text_color="white"
+        )
+        self.new_tab_button.grid(row=0, column=4, padx=(0, 5))
+
+        self.close_tab_button = ctk.CTkButton(
+            self.options_frame,
+            text="Close Tab",
+            command=self.close_tab,
+            width=70,
+            fg_color="#2196F3",
+            hover_color="#1976D2",
             text_color="white"
         )
-        self.cancel_download_button.grid(row=0, column=1, padx=5, pady=5)
+        self.close_tab_button.grid(row=0, column=5, padx=(0, 10))
+
+        self.queue_label = ctk.CTkLabel(self.options_frame, text="", anchor="w")
+        self.queue_label.grid(row=0, column=6, padx=(0, 10))
+
+        self.status_label = ctk.CTkLabel(self.main_frame, text="Status: Initializing...", anchor="w")
+        self.status_label.grid(row=3, column=0, padx=10, pady=(0, 5), sticky="w")
 
-        self.progress_frame.grid_remove()
+        self.download_panel = DownloadPanel(self.main_frame, on_cancel=self.cancel_download)
+        self.download_panel.grid(row=4, column=0, padx=10, pady=(0, 5), sticky="ew")
 
         self.input_field.bind("<Return>", lambda event: self.send_message())
+        self.window.bind("<Escape>", lambda event: self.stop_generation())
+        self.window.bind("<Control-t>", lambda event: self.new_tab())
+        self.window.bind("<Control-w>", lambda event: self.close_tab())
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
 
-        self.context = ""
+        # A router over every node in OLLAMA_HOSTS, else a client for OLLAMA_HOST
+        self.client = make_client()
+        self.aclient = AsyncOllamaClient(base_urls(self.client))
+        self.metrics = default_recorder()
+        self.residency = ResidencyManager(self.client, ram_budget_bytes(), data_path(MODEL_USAGE_FILE))
+        # The response caches are opened during initialize_chatbot
+        self.catalog = ModelCatalog(self.client, data_path(MODEL_CATALOG_FILE))
+        self.response_cache = None
+        self.semantic_cache = None
+        # Every tab's requests go through the one client and its connection pool, and take
+        # turns for the generation slots the servers have
+        nodes = node_count(self.client)
+        self.scheduler = GenerationScheduler(num_parallel() * nodes, max_loaded_models() * nodes)
         self.chain = None
         self.setup_complete = False
-        self.current_model = None
-        self.available_models = []
-        self.download_process = None
-        self.download_cancel_requested = False
+        # The model pulled because none was installed, which the setup waits for
+        self.startup_pull = None
+        self.available_models = self.catalog.names()
+        if self.available_models:
+            self.model_select.configure(values=self.available_models)
+            self.model_select.set(self.available_models[0])
+        self.downloads = DownloadManager(
+            self.client, state_path=data_path(DOWNLOAD_STATE_FILE),
+            on_update=lambda: self.ui.latest("downloads", self.refresh_downloads),
+            on_finish=self.download_finished, io=self.io
+        )
+        self.downloads.start()
+        self.storage = ModelStorage(cache_path=data_path(STORAGE_CACHE_FILE))
+
+        self.store = ConversationStore(data_path(CONVERSATION_DB_FILE))
+        self.new_tab()
+        latest_session = self.store.latest_session()
+        if latest_session is not None:
+            self.active.open_session(latest_session)
+
+        self.startup_timer.step("window", time.perf_counter() - build_start)
+        self.window.after_idle(lambda: self.startup_timer.milestone("interactive"))
+        self.io.submit("startup", self.initialize_chatbot)
+
+    @property
+    def current_model(self):
+        return self.active.model
+
+    @current_model.setter
+    def current_model(self, model_name):
+        self.active.model = model_name
+
+    def new_tab(self):
+        self.tabs_opened += 1
+        title = f"Chat {self.tabs_opened}"
+        tab = self.tabview.add(title)
+        tab.grid_columnconfigure(0, weight=1)
+        tab.grid_rowconfigure(0, weight=1)
+        engine = ChatEngine(self.client, cache=self.response_cache, semantic_cache=self.semantic_cache,
+                            metrics=self.metrics, residency=self.residency, catalog=self.catalog,
+                            scheduler=self.scheduler)
+        session = ChatSession(self, tab, title, engine)
+        session.display.grid(row=0, column=0, sticky="nsew")
+        # A new tab starts with the model of the tab it was opened from
+        session.model = self.active.model if self.active is not None else None
+        self.sessions[title] = session
+        self.tabview.set(title)
+        self.on_tab_change()
+        return session
+
+    def close_tab(self):
+        if len(self.sessions) == 1:
+            self.add_message("System", "The last tab cannot be closed. Use Clear Chat to start over.")
+            return
+        session = self.sessions.pop(self.tabview.get())
+        session.close()
+        self.tabview.delete(session.title)
+        self.on_tab_change()
 
-        threading.Thread(target=self.initialize_chatbot, daemon=True).start()
+    def on_tab_change(self):
+        self.active = self.sessions[self.tabview.get()]
+        if self.active.model:
+            self.model_select.set(self.active.model)
+        self.update_queue_state()
 
     def open_url(self, url):
         webbrowser.open(url)
 
+    def open_compare(self):
+        models = self.model_select.cget("values")
+        if not models:
+            self.add_message("System", "No installed models to compare")
+            return
+        CompareWindow(self.window, self.active.engine, list(models), self.scheduler, self.ui, self.io)
+
+    def open_metrics(self):
+        MetricsWindow(self.window, self.metrics, self.ui, self.startup_timer, self.residency, self.storage)
+
     def refresh_models(self):
-        try:
-            response = requests.get("http://localhost:11434/api/tags")
-            if response.status_code == 200:
-                models = [model["name"] for model in response.json().get("models", [])]
-                self.model_select.configure(values=models)
-                if models:
-                    self.model_select.set(models[0])
-                    self.current_model = models[0]
-                self.add_message("System", f"Found {len(models)} installed models")
-            else:
-                self.add_message("System", "Error fetching installed models")
-        except Exception as e:
-            self.add_message("System", f"Error refreshing models: {str(e)}")
+        def update(catalog):
+            models = [model["name"] for model in catalog]
+            self.model_select.configure(values=models)
+            if models and self.current_model not in models:
+                self.model_select.set(models[0])
+                self.current_model = models[0]
+            self.add_message("System", f"Found {len(models)} installed models")
+
+        # Refreshes asked for in quick succession run once, after any refresh already running
+        self.io.submit("models", self.catalog.refresh, key="refresh models", replace=True, on_result=update,
+                       on_error=lambda e: self.add_message("System", f"Error refreshing models: {str(e)}"))
 
     def on_model_select(self, choice):
         self.current_model = choice
-        self.update_status(f"Selected model: {choice}")
+        model = self.catalog.get(choice)
+        self.update_status(f"Selected model: {choice} ({summary(model)})" if model else f"Selected model: {choice}")
         self.load_model(choice)
 
     def load_model(self, model_name):
-        """Load the selected model into memory"""
-        self.update_status(f"Loading {model_name} into memory...")
+        """Load the selected model into memory unless it is already resident"""
+        self.update_status(f"Selecting {model_name}...")
 
-        def load():
-            try:
-                headers = {"Content-Type": "application/json"}
-                data = {
-                    "model": model_name,
-                    "prompt": " ",
-                    "stream": False
-                }
-                self.add_message("System", f"Loading {model_name} into memory... this may take a moment.")
-                response = requests.post("http://localhost:11434/api/generate", headers=headers, json=data)
-                if response.status_code == 200:
-                    self.update_status(f"Model {model_name} loaded successfully")
-                    self.add_message("System", f"{model_name} is now ready to use")
-                else:
-                    self.update_status(f"Error loading model: {response.text}")
-                    self.add_message("System", f"Failed to load {model_name}: {response.text}")
-            except Exception as e:
+        def loaded(changed):
+            if changed:
+                self.update_status(f"Model {model_name} loaded successfully")
+                self.add_message("System", f"{model_name} is now ready to use")
+            else:
+                self.update_status(f"Model {model_name} is already in memory")
+
+        def failed(e):
+            if isinstance(e, OllamaError):
+                self.update_status(f"Error loading model: {str(e)}")
+                self.add_message("System", f"Failed to load {model_name}: {str(e)}")
+            else:
                 self.update_status(f"Error: {str(e)}")
                 self.add_message("System", f"Error loading model: {str(e)}")
 
-        threading.Thread(target=load, daemon=True).start()
+        engine = self.active.engine
+
+        async def select():
+            changed = await self.io.blocking(self.residency.select, model_name, engine)
+            # The model usually picked next loads in its own operation, which a newer pick replaces
+            self.io.submit("model", self.residency.preload_next, model_name, key="preload", replace=True)
+            return changed
+
+        # Picking models in quick succession only loads the last one picked
+        self.io.submit("model", select, key="load", replace=True, on_result=loaded, on_error=failed)
 
     def unload_model(self):
         model_name = self.current_model
@@ -235,31 +477,23 @@ class ChatbotGUI:
 
         self.update_status(f"Unloading {model_name} from memory...")
 
-        def unload():
-            try:
-                process = subprocess.Popen(
-                    ["ollama", "stop", model_name],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    encoding='utf-8',
-                    errors='replace',
-                    universal_newlines=True
-                )
-                process.wait()
-                if process.returncode == 0:
-                    self.update_status(f"Model {model_name} unloaded from memory")
-                    self.add_message("System", f"Successfully unloaded {model_name} from memory")
-                else:
-                    stdout_output = process.stdout.read() if hasattr(process.stdout, 'read') else ""
-                    stderr_output = process.stderr.read() if hasattr(process.stderr, 'read') else ""
-                    error_output = stderr_output or stdout_output or "Unknown error"
-                    self.update_status("Failed to unload model!")
-                    self.add_message("System", f"Failed to unload {model_name}: {error_output}")
-            except Exception as e:
+        async def unload():
+            await self.aclient.unload(model_name)
+            await self.io.blocking(self.residency.refresh)
+
+        def unloaded(_):
+            self.update_status(f"Model {model_name} unloaded from memory")
+            self.add_message("System", f"Successfully unloaded {model_name} from memory")
+
+        def failed(e):
+            if isinstance(e, OllamaError):
+                self.update_status("Failed to unload model!")
+                self.add_message("System", f"Failed to unload {model_name}: {str(e)}")
+            else:
                 self.update_status("Unloading failed!")
                 self.add_message("System", f"Error unloading model: {str(e)}")
 
-        threading.Thread(target=unload, daemon=True).start()
+        self.io.submit("model", unload, key=("unload", model_name), on_result=unloaded, on_error=failed)
 
     def remove_model(self):
         model_name = self.current_model
@@ -309,467 +543,232 @@ class ChatbotGUI:
     def execute_model_removal(self, model_name):
         self.update_status(f"Removing {model_name}...")
 
-        def remove():
-            try:
-                process = subprocess.Popen(
-                    ["ollama", "rm", model_name],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    encoding='utf-8',
-                    errors='replace',
-                    universal_newlines=True
-                )
-                process.wait()
-                if process.returncode == 0:
-                    self.update_status("Model removed successfully!")
-                    self.add_message("System", f"Successfully removed {model_name}")
-                    self.window.after(0, self.refresh_models)
-                else:
-                    stdout_output = process.stdout.read() if hasattr(process.stdout, 'read') else ""
-                    stderr_output = process.stderr.read() if hasattr(process.stderr, 'read') else ""
-                    error_output = stderr_output or stdout_output or "Unknown error"
-                    self.update_status("Failed to remove model!")
-                    self.add_message("System", f"Failed to remove {model_name}: {error_output}")
-            except Exception as e:
+        async def remove():
+            await self.aclient.delete(model_name)
+            await self.io.blocking(self.catalog.forget, model_name)
+            await self.io.blocking(self.residency.forget, model_name)
+
+        def removed(_):
+            for session in self.sessions.values():
+                session.engine.forget_model(model_name)
+            self.update_status("Model removed successfully!")
+            self.add_message("System", f"Successfully removed {model_name}")
+            self.refresh_models()
+            self.rescan_storage()
+
+        def failed(e):
+            if isinstance(e, OllamaError):
+                self.update_status("Failed to remove model!")
+                self.add_message("System", f"Failed to remove {model_name}: {str(e)}")
+            else:
                 self.update_status("Removal failed!")
                 self.add_message("System", f"Error removing model: {str(e)}")
 
-        threading.Thread(target=remove, daemon=True).start()
+        self.io.submit("model", remove, key=("remove", model_name), on_result=removed, on_error=failed)
 
-    def show_progress_frame(self):
-        def update():
-            self.progress_frame.grid()
-            self.progress_bar.set(0)
-            self.progress_label.configure(text="Starting download...")
-        self.window.after(0, update)
-
-    def hide_progress_frame(self):
-        def update():
-            self.progress_frame.grid_remove()
-        self.window.after(0, update)
-
-    def update_progress(self, progress, text):
-        def update():
-            self.progress_bar.set(progress)
-            self.progress_label.configure(text=text)
-        self.window.after(0, update)
-
-    def parse_progress(self, line):
-        try:
-            if any(x in line.lower() for x in ["pulling", "initializing", "preparing", "reading", "computing", "writing"]):
-                return 0.03
-
-            progress_match = re.search(r'(\d+\.\d+)%', line)
-            if progress_match:
-                progress_percent = float(progress_match.group(1)) / 100
-                return progress_percent
-
-            mb_match = re.search(r'(\d+)(?:\.\d+)?MB/(\d+)(?:\.\d+)?MB', line)
-            if mb_match:
-                current_mb = float(mb_match.group(1))
-                total_mb = float(mb_match.group(2))
-                if total_mb > 0:
-                    return current_mb / total_mb
-
-            layer_match = re.search(r'layer: (\d+)/(\d+)', line)
-            if layer_match:
-                current_layer = int(layer_match.group(1))
-                total_layers = int(layer_match.group(2))
-                if total_layers > 0:
-                    return current_layer / total_layers
-
-            if "downloading" in line.lower():
-                return 0.05
-
-            return None
-        except Exception as e:
-            print(f"Error parsing progress: {e}")
-            return None
+    def refresh_downloads(self):
+        self.download_panel.refresh(self.downloads.snapshot())
 
     def download_model(self):
         model_name = self.model_entry.get().strip()
         if not model_name:
             self.add_message("System", "Please enter a model name")
             return
-
-        self.update_status(f"Downloading {model_name}...")
-        self.show_progress_frame()
-
-        def disable_download():
-            self.download_button.configure(state="disabled", text="Downloading...")
-            self.model_entry.configure(state="disabled")
-        self.window.after(0, disable_download)
-
-        def download():
-            try:
-                self.update_progress(0.05, "Starting download...")
-                download_successful = self.download_model_via_api(model_name)
-
-                if not download_successful:
-                    self.add_message("System", "API download failed. Falling back to CLI method...")
-                    download_successful = self.download_model_via_cli(model_name)
-
-                if download_successful:
-                    self.update_status("Download complete!")
-                    self.update_progress(1.0, f"Download complete: {model_name}")
-                    self.add_message("System", f"Successfully downloaded {model_name}")
-                    self.refresh_models()
-                else:
-                    self.update_status("Download failed!")
-                    self.update_progress(0.1, "Download failed")
-                    self.add_message("System", f"Failed to download {model_name}. Please check the model name and try again.")
-
-                self.window.after(2000, self.hide_progress_frame)
-            except Exception as e:
-                self.update_status("Download failed!")
-                self.update_progress(0, "Error during download")
-                self.add_message("System", f"Error downloading model: {str(e)}")
-                self.window.after(2000, self.hide_progress_frame)
-            finally:
-                def enable_download():
-                    self.download_button.configure(state="normal", text="Download")
-                    self.model_entry.configure(state="normal")
-                self.window.after(0, enable_download)
-
-        threading.Thread(target=download, daemon=True).start()
-
-    def download_model_via_api(self, model_name):
-        try:
-            url = "http://localhost:11434/api/pull"
-            payload = {"name": model_name, "stream": False}
-            headers = {"Content-Type": "application/json"}
-
-            with requests.post(url, json=payload, headers=headers, stream=True) as response:
-                if response.status_code != 200:
-                    error_text = response.text
-                    self.add_message("System", f"API Error: {error_text}")
-                    return False
-
-                accumulated_data = ""
-                current_progress = 0.05
-                last_progress_update = time.time()
-
-                for line in response.iter_lines():
-                    if line:
-                        try:
-                            data = json.loads(line.decode('utf-8'))
-                            if "status" in data:
-                                status_msg = data["status"]
-                                self.update_status(f"Status: {status_msg}")
-
-                            if "completed" in data and "total" in data:
-                                completed = data["completed"]
-                                total = data["total"]
-                                if total > 0:
-                                    progress = completed / total
-                                    if time.time() - last_progress_update > 0.5:
-                                        self.update_progress(progress, f"Downloading {model_name}: {int(progress * 100)}%")
-                                        last_progress_update = time.time()
-                                    current_progress = progress
-
-                            if "status" in data:
-                                status = data["status"].lower()
-                                if "downloading" in status and current_progress < 0.1:
-                                    current_progress = 0.1
-                                    self.update_progress(current_progress, f"Downloading {model_name}...")
-                                elif "verifying" in status or "validating" in status and current_progress < 0.7:
-                                    current_progress = 0.7
-                                    self.update_progress(current_progress, f"Verifying {model_name}...")
-                                elif "extracting" in status or "unpacking" in status and current_progress < 0.8:
-                                    current_progress = 0.8
-                                    self.update_progress(current_progress, f"Extracting {model_name}...")
-                                elif "writing" in status or "finalizing" in status and current_progress < 0.9:
-                                    current_progress = 0.9
-                                    self.update_progress(current_progress, f"Finalizing {model_name}...")
-
-                            if "done" in data.get("status", "").lower():
-                                self.update_progress(1.0, f"Download complete: {model_name}")
-                                return True
-
-                            if "error" in data:
-                                error_msg = data["error"]
-                                self.add_message("System", f"Download error: {error_msg}")
-                                return False
-
-                        except json.JSONDecodeError as je:
-                            accumulated_data += line.decode('utf-8')
-
-                if current_progress > 0.5:
-                    return True
-                else:
-                    if accumulated_data:
-                        self.add_message("System", f"Incomplete download: {accumulated_data}")
-                    return False
-
-        except requests.RequestException as e:
-            self.add_message("System", f"API request error: {str(e)}")
-            return False
-        except json.JSONDecodeError as je:
-            self.add_message("System", f"Error parsing API response: {str(je)}")
-            return False
-        except Exception as e:
-            self.add_message("System", f"API download error: {str(e)}")
-            return False
-
-    def download_model_via_cli(self, model_name):
-        """Improved CLI download method with robust cancellation and progress"""
-        try:
-            self.download_process = subprocess.Popen(
-                ["ollama", "pull", model_name],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdin=subprocess.DEVNULL,
-                encoding='utf-8',
-                errors='replace',
-                universal_newlines=True
-            )
-
-            start_time = time.time()
-            max_time_without_output = 60
-            last_output_time = start_time
-            current_progress = 0.05
-            download_output = []
-            progress_update_time = time.time()
-
-            def read_stream(stream, output_list, is_stderr=False):
-                while True:
-                    line = stream.readline()
-                    if not line:
-                        break
-                    clean_line = self.remove_ansi_escape_sequences(line.strip())
-                    if clean_line:
-                        output_list.append(clean_line)
-                        if is_stderr:
-                            self.add_message("System", f"Error: {clean_line}")
-                        else:
-                            if time.time() - progress_update_time > 0.5:
-                                self.window.after(0, lambda cl=clean_line: self.update_status(f"Downloading: {cl}"))
-                                progress_update_time = time.time()
-
-            stdout_lines = []
-            stderr_lines = []
-
-            stdout_thread = threading.Thread(target=read_stream, args=(self.download_process.stdout, stdout_lines), daemon=True)
-            stderr_thread = threading.Thread(target=read_stream, args=(self.download_process.stderr, stderr_lines, True), daemon=True)
-
-            stdout_thread.start()
-            stderr_thread.start()
-
-            while self.download_process.poll() is None:
-                if self.download_cancel_requested:
-                    try:
-                        self.download_process.terminate()
-                        self.download_process.wait(timeout=2)
-                    except subprocess.TimeoutExpired:
-                        self.download_process.kill()
-                    return False
-
-                if time.time() - last_output_time > max_time_without_output:
-                    self.add_message("System", "Download seems stuck. Terminating process.")
-                    self.download_process.kill()
-                    return False
-
-                # Pulse progress bar even without new output
-                if time.time() - progress_update_time > 1.0:
-                    pulse_progress = min(0.9, current_progress + 0.05)
-                    self.update_progress(pulse_progress, f"Downloading {model_name}...")
-                    current_progress = pulse_progress
-                    progress_update_time = time.time()
-
-                time.sleep(0.2)
-
-            stdout_thread.join()
-            stderr_thread.join()
-
-            full_output = "\n".join(stdout_lines + stderr_lines).lower()
-            success_indicators = ["downloaded", "complete", "finished", "success"]
-            for indicator in success_indicators:
-                if indicator in full_output:
-                    return True
-
-            if stdout_lines or stderr_lines:
-                return True
-
-            return False
-
-        except Exception as e:
-            self.add_message("System", f"CLI download error: {str(e)}")
-            return False
-        finally:
-            self.download_cancel_requested = False
-
-    def remove_ansi_escape_sequences(self, text):
-        ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-        return ansi_escape.sub('', text)
+        self.model_entry.delete(0, "end")
+        self.downloads.enqueue(model_name)
+        self.update_status(f"Queued download of {model_name}")
+
+    def cancel_download(self, model_name):
+        if self.downloads.cancel(model_name):
+            self.update_status(f"Canceling download of {model_name}...")
+
+    def download_finished(self, download):
+        if download.model_name == self.startup_pull:
+            self.startup_pull = None
+            self.io.submit("startup", self.continue_setup)
+        if download.state == DONE:
+            self.update_status("Download complete!")
+            self.add_message("System", f"Successfully downloaded {download.model_name}")
+            self.refresh_models()
+            self.rescan_storage()
+        elif download.state == CANCELLED:
+            self.update_status("Download canceled")
+            self.add_message("System", f"Download of {download.model_name} canceled by user.")
+        else:
+            self.update_status("Download failed!")
+            self.add_message("System", f"Failed to download {download.model_name}: {download.error}")
 
     def get_available_models(self):
         try:
-            response = requests.get("http://localhost:11434/api/tags")
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-                return [model["name"] for model in models]
-            return []
-        except requests.exceptions.RequestException:
+            return [model["name"] for model in self.catalog.refresh()]
+        except (requests.exceptions.RequestException, OllamaError):
             return []
 
     def check_disk_usage(self):
-        try:
-            if sys.platform == "linux":
-                path = "/usr/share/ollama/models"
-            elif sys.platform == "darwin":
-                path = "/usr/local/share/ollama/models"
-            elif sys.platform == "win32":
-                path = r"C:\ProgramData\ollama\models"
-
-            if os.path.exists(path):
-                total_size = sum(os.path.getsize(os.path.join(path, f))
-                                 for f in os.listdir(path) if os.path.isfile(os.path.join(path, f)))
-                size_gb = total_size / (1024 ** 3)
-                self.add_message("System", f"Total models size: {size_gb:.2f} GB")
-        except Exception as e:
-            self.add_message("System", f"Error checking disk usage: {str(e)}")
+        """Scan the model store in the background and report how much disk the models use"""
+        def report_usage(report):
+            if report is None:
+                return
+            size_gb = report["total_bytes"] / (1024 ** 3)
+            shared_gb = report["shared_bytes"] / (1024 ** 3)
+            self.add_message("System", f"Total models size: {size_gb:.2f} GB for {len(report['models'])} models "
+                                       f"({shared_gb:.2f} GB in layers shared between models)")
 
-    def update_model_dropdown_state(self, state):
-        def update():
-            self.model_select.configure(state=state)
-            self.refresh_button.configure(state=state)
-            self.remove_button.configure(state=state)
-            self.unload_button.configure(state=state)
-        self.window.after(0, update)
+        self.io.submit("storage", self.startup_timer.timed, "disk usage", self.storage.scan, key="scan storage",
+                       on_result=report_usage,
+                       on_error=lambda e: self.add_message("System", f"Error checking disk usage: {str(e)}"))
+
+    def rescan_storage(self):
+        # Only directories that changed since the last scan are listed again
+        self.io.submit("storage", self.storage.scan, key="rescan storage", replace=True, on_error=lambda e: None)
 
     def is_ollama_running(self):
-        try:
-            response = requests.get("http://localhost:11434")
-            return response.status_code == 200
-        except requests.exceptions.ConnectionError:
-            return False
+        return self.client.is_running()
 
     def start_ollama(self):
-        try:
-            if sys.platform == "win32":
-                subprocess.Popen(["ollama", "serve"], creationflags=subprocess.CREATE_NEW_CONSOLE)
-            else:
-                subprocess.Popen(["ollama", "serve"],
-                                 stdout=subprocess.DEVNULL,
-                                 stderr=subprocess.DEVNULL)
-            max_retries = 10
-            for i in range(max_retries):
-                if self.is_ollama_running():
-                    return True
-                time.sleep(2)
-            return False
-        except FileNotFoundError:
-            return False
+        ready, reason = OllamaServer(self.client, log_path=data_path(OLLAMA_LOG_FILE)).start()
+        if ready:
+            # The router marked the node down before the server was up
+            check_nodes(self.client)
+        else:
+            self.add_message("System", f"Error: Could not start Ollama service. {reason}")
+        return ready
 
     def initialize_chatbot(self):
-        self.update_status("Checking Ollama service...")
-        if not self.is_ollama_running():
-            self.update_status("Starting Ollama service...")
-            if not self.start_ollama():
-                self.update_status("Error: Could not start Ollama service")
-                self.add_message("System", "Error: Could not start Ollama service. Make sure Ollama is installed.")
-                return
+        """Get the server and models ready while the caches open and disk usage is counted"""
+        timer = self.startup_timer
+        self.check_disk_usage()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            caches = executor.submit(timer.timed, "caches", self.open_caches)
+            ready = timer.timed("server", self.ensure_server)
+            if ready:
+                self.update_status("Getting available models...")
+                self.available_models = timer.timed("model list", self.get_available_models)
+            try:
+                caches.result()
+            except Exception as e:
+                self.add_message("System", f"Response caches are unavailable: {str(e)}")
+        if not ready:
+            return
+        self.residency.start()
+        if node_count(self.client) > 1:
+            healthy = [node["url"] for node in self.client.stats() if node["healthy"]]
+            self.add_message("System", f"Spreading requests over {len(healthy)} of {node_count(self.client)} "
+                                       f"Ollama nodes: {', '.join(healthy)}")
+        resumed = self.downloads.resume()
+        if resumed:
+            self.add_message("System", f"Resuming interrupted downloads: {', '.join(resumed)}")
 
-        self.update_status("Getting available models...")
-        self.available_models = self.get_available_models()
         if not self.available_models:
             self.update_status("No models found. Downloading llama3 model...")
-            self.download_model_with_name("llama3")
-            self.available_models = self.get_available_models()
-            if not self.available_models:
-                self.update_status("Error: Failed to download llama3 model")
-                self.add_message("System", "Error: Failed to download llama3 model. Please try downloading a model manually.")
-                return
+            # Setup goes on in download_finished once the pull ends, so no I/O thread waits for it
+            self.startup_pull = "llama3"
+            self.downloads.enqueue(self.startup_pull)
+            return
+        self.finish_setup()
 
-        try:
-            self.update_status("Initializing AI model...")
-            self.model_select.configure(values=self.available_models)
-            self.model_select.set(self.available_models[0])
-            self.current_model = self.available_models[0]
-            self.setup_complete = True
-            self.update_status(f"Ready with model: {self.current_model}")
-            self.add_message("System", f"Hello! I'm ready to chat using the {self.current_model} model. How can I help you today?")
-            self.check_disk_usage()
-        except Exception as e:
-            self.update_status(f"Error: {str(e)}")
-            self.add_message("System", f"Error initializing chatbot: {str(e)}")
+    def continue_setup(self):
+        """Finish the setup once the model pulled because none was installed has downloaded"""
+        self.available_models = self.get_available_models()
+        if not self.available_models:
+            self.update_status("Error: Failed to download llama3 model")
+            self.add_message("System", "Error: Failed to download llama3 model. Please try downloading a model manually.")
+            return
+        self.finish_setup()
 
-    def download_model_with_name(self, model_name):
-        try:
-            self.show_progress_frame()
-            process = subprocess.Popen(
-                ["ollama", "pull", model_name],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                encoding='utf-8',
-                errors='replace',
-                universal_newlines=True
-            )
-
-            download_output = []
-            last_progress_time = time.time()
-            last_update_time = time.time()
-            progress_seen = False
-
-            for line in process.stdout:
-                clean_line = ''.join(c for c in line if c.isprintable() and c not in '\r\x1b')
-                clean_line = self.remove_ansi_escape_sequences(clean_line)
-                if clean_line.strip():
-                    download_output.append(clean_line.strip())
-                    progress = self.parse_progress(clean_line)
-                    if progress is not None:
-                        progress_seen = True
-                        self.update_progress(progress, f"Downloading {model_name}: {int(progress * 100)}%")
-                        last_progress_time = time.time()
-                    if time.time() - last_update_time > 0.5:
-                        self.update_status(f"Downloading: {clean_line.strip()}")
-                        last_update_time = time.time()
-                    if not progress_seen and time.time() - last_progress_time > 3:
-                        pulse_progress = (time.time() % 0.6) / 0.6 * 0.1 + 0.05
-                        self.update_progress(pulse_progress, f"Downloading {model_name}...")
-                        last_progress_time = time.time()
-
-            process.wait()
-            self.hide_progress_frame()
-
-            if process.returncode == 0:
-                self.update_status(f"Model {model_name} downloaded successfully")
-                self.add_message("System", f"Successfully downloaded {model_name}")
-                return True
-            else:
-                stderr_output = process.stderr.read() if hasattr(process.stderr, 'read') else ""
-                error_output = stderr_output if stderr_output else "\n".join(download_output)
-                self.update_status(f"Download failed: {error_output}")
-                self.add_message("System", f"Error downloading {model_name}: {error_output}")
-                print(f"Ollama pull error (code {process.returncode}): {error_output}")
-                return False
-        except Exception as e:
-            self.update_status(f"Error downloading model: {str(e)}")
-            self.add_message("System", f"Exception during download: {str(e)}")
-            print(f"Exception during model download: {str(e)}")
-            self.hide_progress_frame()
-            return False
+    def finish_setup(self):
+        timer = self.startup_timer
+
+        def finish():
+            try:
+                # Keep a model picked from the cached list while the server was starting
+                selected = self.model_select.get()
+                if selected not in self.available_models:
+                    selected = self.available_models[0]
+                self.model_select.configure(values=self.available_models)
+                self.model_select.set(selected)
+                self.current_model = selected
+                self.setup_complete = True
+                self.update_status(f"Ready with model: {self.current_model}")
+                self.add_message("System", f"Hello! I'm ready to chat using the {self.current_model} model. How can I help you today?")
+            except Exception as e:
+                self.update_status(f"Error: {str(e)}")
+                self.add_message("System", f"Error initializing chatbot: {str(e)}")
+            timer.milestone("ready")
+            print(f"Startup: {timer.summary()}")
+        self.ui.call(finish)
+
+    def ensure_server(self):
+        self.update_status("Checking Ollama service...")
+        if self.is_ollama_running():
+            return True
+        self.update_status("Starting Ollama service...")
+        if self.start_ollama():
+            return True
+        self.update_status("Error: Could not start Ollama service")
+        return False
+
+    def open_caches(self):
+        # numpy is only imported here, off the UI thread
+        from semantic_cache import SemanticCache
+
+        response_cache = ResponseCache(data_path(RESPONSE_CACHE_FILE))
+        semantic_cache = SemanticCache(data_path(SEMANTIC_CACHE_DIR), EMBED_MODEL, threshold=SEMANTIC_CACHE_THRESHOLD)
+
+        def apply():
+            # On the UI thread, so a tab opened meanwhile cannot miss the caches
+            self.response_cache = response_cache
+            self.semantic_cache = semantic_cache
+            for session in self.sessions.values():
+                session.engine.cache = response_cache
+                session.engine.semantic_cache = semantic_cache
+        self.ui.call(apply)
 
     def clear_chat(self):
-        self.chat_display.configure(state="normal")
-        self.chat_display.delete("1.0", "end")
-        self.chat_display.configure(state="disabled")
-        self.context = ""
-        self.add_message("System", "Chat history cleared.")
+        self.active.clear()
+        self.add_message("System", "Chat history cleared. The previous conversation can be reopened from History.")
+
+    def open_history(self):
+        sessions = self.store.sessions()
+        if not sessions:
+            self.add_message("System", "No saved conversations yet")
+            return
+
+        history_window = ctk.CTkToplevel(self.window)
+        history_window.title("Conversation History")
+        history_window.geometry("500x400")
+        history_window.transient(self.window)
+
+        session_list = ctk.CTkScrollableFrame(history_window)
+        session_list.pack(fill="both", expand=True, padx=10, pady=10)
+
+        def choose(session_id):
+            history_window.destroy()
+            self.active.open_session(session_id)
+
+        for session in sessions:
+            updated = datetime.fromtimestamp(session["updated_at"]).strftime("%Y-%m-%d %H:%M")
+            title = session["title"] or "(untitled)"
+            ctk.CTkButton(
+                session_list,
+                text=f"{updated}  {title}  ({session['messages']} messages)",
+                anchor="w",
+                command=lambda session_id=session["id"]: choose(session_id),
+                fg_color="#2196F3" if session["id"] == self.active.session_id else "transparent",
+                hover_color="#1976D2"
+            ).pack(fill="x", pady=2)
+
+    def update_status(self, status, session=None):
+        if session is not None and len(self.sessions) > 1:
+            status = f"{session.title}: {status}"
 
-    def update_status(self, status):
         def update():
             self.status_label.configure(text=f"Status: {status}")
-        self.window.after(0, update)
+        self.ui.latest("status", update)
 
     def add_message(self, sender, message):
-        def update():
-            self.chat_display.configure(state="normal")
-            timestamp = datetime.now().strftime("%H:%M")
-            self.chat_display.insert("end", f"[{timestamp}] {sender}: {message}\n")
-            self.chat_display.configure(state="disabled")
-            self.chat_display.see("end")
-        self.window.after(0, update)
+        """Show a message in the active tab"""
+        self.active.add_message(sender, message)
 
     def send_message(self):
         if not self.setup_complete:
@@ -782,50 +781,66 @@ class ChatbotGUI:
         if not message:
             return
         self.input_field.delete(0, "end")
-        self.add_message("You", message)
-        self.send_button.configure(state="disabled")
-        self.update_model_dropdown_state("disabled")
-
-        def process_message():
-            try:
-                template = """
-                Answer the question below.
-                Here is the conversation history:
-                {context}
-                Question: {question}
-                Answer:
-                """
-                model = OllamaLLM(model=self.current_model)
-                chain = ChatPromptTemplate.from_template(template) | model
-                result = chain.invoke({
-                    "context": self.context,
-                    "question": message
-                })
-                bot_response = str(result)
-                self.context += f"\nUser: {message}\nAI: {bot_response}"
-                self.add_message(f"Bot ({self.current_model})", bot_response)
-            except Exception as e:
-                self.add_message("System", f"Error: {str(e)}")
-            finally:
-                self.window.after(0, lambda: self.send_button.configure(state="normal"))
-                self.window.after(0, lambda: self.update_model_dropdown_state("normal"))
-
-        threading.Thread(target=process_message, daemon=True).start()
+        # Settings are taken when the message is sent, so changing them affects only later messages
+        settings = {
+            "stream": self.stream_var.get(),
+            "chat_mode": self.chat_mode_var.get(),
+            "sampling_options": dict(DETERMINISTIC_OPTIONS) if self.deterministic_var.get() else {},
+            "semantic_cache": self.semantic_cache_var.get(),
+        }
+        self.active.send(message, settings)
+
+    def stop_generation(self):
+        if self.active.stop():
+            self.update_status("Stopping generation...", self.active)
+
+    def queue_changed(self):
+        self.ui.latest("queue", self.update_queue_state)
+
+    def update_queue_state(self):
+        """Show the active tab's queue next to the switches"""
+        stats = self.active.requests.stats()
+        self.stop_button.configure(state="normal" if stats["busy"] else "disabled")
+        if stats["waiting_for_slot"]:
+            generating = self.scheduler.stats()["generating"]
+            text = f"Waiting for the server ({generating} answers generating in other tabs)"
+        elif stats["queued"]:
+            text = f"{stats['queued']} queued, waiting {stats['mean_wait_s']:.1f}s on average"
+        else:
+            text = ""
+        if stats["waiting_for_slot"] and stats["queued"]:
+            text += f", {stats['queued']} more queued"
+        self.queue_label.configure(text=text)
+
+    def show_reply_stats(self, session, model_name, stats):
+        if session.closed:
+            return
+        if stats.get("cache_hit") and "similarity" in stats:
+            self.update_status(f"{model_name}: answered from a similar earlier question "
+                               f"(similarity {stats['similarity']:.3f})", session)
+            return
+        if stats.get("cache_hit"):
+            cache_stats = session.engine.cache.stats()
+            self.update_status(f"{model_name}: answered from cache "
+                               f"({cache_stats['hits']} hits, {cache_stats['misses']} misses)", session)
+            return
+        status = f"{model_name}: done in {stats.get('latency_s', 0):.2f}s"
+        if stats.get("queue_wait_s", 0) >= 0.1:
+            status += f" after waiting {stats['queue_wait_s']:.1f}s in the queue"
+        if "ttft_s" in stats:
+            status += f", first token in {stats['ttft_s']:.2f}s"
+        if "prompt_eval_count" in stats:
+            prompt_ms = stats.get("prompt_eval_duration", 0) / 1e6
+            status += (f", prompt eval {stats['prompt_eval_count']} tokens in {prompt_ms:.0f} ms"
+                       f", {stats.get('eval_count', 0)} tokens generated")
+        self.update_status(status, session)
 
     def on_closing(self):
         try:
             self.update_status("Shutting down Ollama...")
-            stop_ollama = messagebox.askyesno("Exit", "Stop Ollama server when closing?") if messagebox_available else True
+            stop_ollama = messagebox.askyesno("Exit", "Stop Ollama server when closing?")
             if stop_ollama:
-                if self.available_models:
-                    for model in self.available_models:
-                        try:
-                            subprocess.run(["ollama", "stop", model],
-                                           stdout=subprocess.DEVNULL,
-                                           stderr=subprocess.DEVNULL,
-                                           timeout=2)
-                        except:
-                            pass
+                self.client.unload_running(deadline=SHUTDOWN_DEADLINE)
                 if sys.platform == "win32":
                     subprocess.run(["taskkill", "/f", "/im", "ollama.exe"],
                                    stdout=subprocess.DEVNULL,
@@ -837,29 +852,55 @@ class ChatbotGUI:
         except Exception as e:
             print(f"Error during shutdown: {str(e)}")
         finally:
-            self.window.destroy()
-
-    def cancel_download(self):
-        if self.download_process:
-            self.download_cancel_requested = True
-            self.update_status("Canceling download...")
-            self.add_message("System", "Download canceled by user.")
-
+            for session in self.sessions.values():
+                session.requests.cancel_all()
+            self.residency.stop()
+            # Write the similar-question cache's memory-mapped arrays out now, not whenever they are collected
+            if self.semantic_cache is not None:
+                try:
+                    self.semantic_cache.flush()
+                except OSError as e:
+                    print(f"Error saving the semantic cache: {str(e)}")
+            # The async client's connections belong to the loop, so they are closed on it before it stops
             try:
-                # First attempt to terminate gracefully
-                self.download_process.terminate()
-                # Wait for termination with timeout
-                self.download_process.wait(timeout=2)
-            except subprocess.TimeoutExpired:
-                # Force kill if it doesn't respond
-                self.download_process.kill()
-                self.add_message("System", "Process forcefully killed.")
+                self.io.submit("shutdown", self.aclient.aclose).result(timeout=SHUTDOWN_DEADLINE)
+            except Exception as e:
+                print(f"Error closing connections: {str(e)}")
+            self.io.stop()
+            self.ui.stop()
+            self.window.destroy()
 
     def run(self):
         self.window.mainloop()
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="AI Chatbot with Ollama integration")
+    parser.add_argument("--batch", metavar="INPUT", help="run prompts from a JSONL file without the GUI")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--model", default="llama3", help="model used for prompts without a 'model' field")
+    parser.add_argument("--concurrency", type=int, default=4, help="maximum requests in flight")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--prompt-field", default="prompt")
+    return parser.parse_args()
+
+
+def run_batch(args):
+    from batch import BatchRunner
+
+    engine = ChatEngine(make_client(), cache=ResponseCache(data_path(RESPONSE_CACHE_FILE)), metrics=default_recorder())
+    if not engine.client.is_running():
+        print(f"Ollama is not reachable at {engine.client.base_url}", file=sys.stderr)
+        return 1
+    runner = BatchRunner(engine, args.model, args.concurrency, args.id_field, args.prompt_field)
+    counts = runner.run(args.batch, args.output)
+    return 1 if counts["error"] else 0
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.batch:
+        sys.exit(run_batch(args))
     ctk.set_appearance_mode("dark")
     ctk.set_default_color_theme("blue")
     app = ChatbotGUI()
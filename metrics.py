@@ -0,0 +1,175 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from app_paths import data_path
+
+# Requests per model the rolling percentiles are computed over
+ROLLING_WINDOW = 200
+# Timing and token fields Ollama returns with the final chunk of a response
+SERVER_FIELDS = (
+    "total_duration", "load_duration",
+    "prompt_eval_count", "prompt_eval_duration",
+    "eval_count", "eval_duration",
+)
+FORMATS = ("jsonl", "prometheus")
+DEFAULT_FILES = {"jsonl": "metrics.jsonl", "prometheus": "metrics.prom"}
+
+
+def metrics_format():
+    """Export format from CHATBOT_METRICS_FORMAT: jsonl (default) or prometheus"""
+    fmt = os.environ.get("CHATBOT_METRICS_FORMAT", "jsonl").lower()
+    return fmt if fmt in FORMATS else "jsonl"
+
+
+def default_recorder():
+    """Recorder exporting to CHATBOT_METRICS_FILE, else metrics.jsonl / metrics.prom in the data directory"""
+    fmt = metrics_format()
+    return MetricsRecorder(os.environ.get("CHATBOT_METRICS_FILE") or data_path(DEFAULT_FILES[fmt]), fmt)
+
+
+def tokens_per_second(stats):
+    if stats.get("eval_duration"):
+        return stats.get("eval_count", 0) / (stats["eval_duration"] / 1e9)
+    return None
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class MetricsRecorder:
+    """Per-request generation metrics with per-model rolling percentiles.
+
+    Every request is kept in memory (the last ROLLING_WINDOW per model) and
+    exported to `path`: as JSONL, one line appended per request, or as a
+    Prometheus text file rewritten after every request for a textfile
+    collector to scrape. Answers served from a cache are counted, but kept
+    out of the timing percentiles. Safe to call from several threads.
+    """
+
+    def __init__(self, path=None, fmt="jsonl", window=ROLLING_WINDOW):
+        self.path = path
+        self.fmt = fmt
+        self.lock = threading.Lock()
+        self.recent = defaultdict(lambda: deque(maxlen=window))
+        # Lifetime counters per model for the Prometheus export
+        self.totals = defaultdict(lambda: defaultdict(float))
+
+    def record(self, model_name, stats, kind="chat"):
+        entry = {
+            "time": time.time(),
+            "model": model_name,
+            "kind": kind,
+            "cache_hit": bool(stats.get("cache_hit")),
+            "ttft_s": stats.get("ttft_s"),
+            "latency_s": stats.get("latency_s"),
+            # Time the message waited behind earlier ones in its session's queue
+            "queue_wait_s": stats.get("queue_wait_s"),
+        }
+        entry.update({field: stats[field] for field in SERVER_FIELDS if field in stats})
+        entry["tokens_per_s"] = tokens_per_second(stats)
+
+        with self.lock:
+            self.recent[model_name].append(entry)
+            totals = self.totals[model_name]
+            totals["requests"] += 1
+            totals["cache_hits"] += entry["cache_hit"]
+            if not entry["cache_hit"]:
+                totals["latency_seconds"] += entry["latency_s"] or 0
+            totals["prompt_tokens"] += entry.get("prompt_eval_count", 0)
+            totals["generated_tokens"] += entry.get("eval_count", 0)
+            if self.path:
+                try:
+                    self.export(entry)
+                except OSError:
+                    pass
+        return entry
+
+    def export(self, entry):
+        if self.fmt == "prometheus":
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, self.path)
+        else:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def summary(self):
+        """Rolling p50/p95 per model over the recent requests that were generated, not served from a cache"""
+        with self.lock:
+            recent = {model: list(entries) for model, entries in self.recent.items()}
+        result = {}
+        for model, entries in recent.items():
+            row = {"requests": len(entries), "cache_hits": sum(e["cache_hit"] for e in entries)}
+            generated = [e for e in entries if not e["cache_hit"]]
+            for field in ("ttft_s", "latency_s", "tokens_per_s", "prompt_eval_duration", "load_duration"):
+                values = sorted(e[field] for e in generated if e.get(field) is not None)
+                row[field] = {"p50": percentile(values, 0.5), "p95": percentile(values, 0.95)}
+            result[model] = row
+        return result
+
+    def recent_requests(self, limit=20):
+        with self.lock:
+            entries = [e for model_entries in self.recent.values() for e in model_entries]
+        entries.sort(key=lambda e: e["time"], reverse=True)
+        return entries[:limit]
+
+    def prometheus_text(self):
+        """Counters and rolling quantiles in the Prometheus text exposition format.
+
+        Must be called with the lock held.
+        """
+        lines = []
+        counters = (
+            ("requests", "chatbot_requests_total", "Requests answered"),
+            ("cache_hits", "chatbot_cache_hits_total", "Requests answered from a response cache"),
+            ("prompt_tokens", "chatbot_prompt_tokens_total", "Prompt tokens evaluated by the server"),
+            ("generated_tokens", "chatbot_generated_tokens_total", "Tokens generated by the server"),
+        )
+        for key, name, help_text in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for model, totals in sorted(self.totals.items()):
+                lines.append(f'{name}{{model="{escape_label(model)}"}} {totals[key]:g}')
+
+        # Quantiles cover the recent generated requests (cache hits would pull them towards zero);
+        # the latency summary also carries their lifetime _sum and _count. The gauges have no
+        # _sum/_count, so they label their p50/p95 `percentile`, which tools do not read as a summary
+        quantiles = (
+            ("latency_s", "chatbot_latency_seconds", "summary", "End-to-end latency of generated answers", 1),
+            ("ttft_s", "chatbot_ttft_seconds", "gauge", "Time to first token over recent requests", 1),
+            ("tokens_per_s", "chatbot_tokens_per_second", "gauge", "Generation speed over recent requests", 1),
+            ("prompt_eval_duration", "chatbot_prompt_eval_seconds", "gauge",
+             "Prompt eval time over recent requests", 1e-9),
+        )
+        for field, name, metric_type, help_text, scale in quantiles:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for model, entries in sorted(self.recent.items()):
+                label = escape_label(model)
+                values = sorted(e[field] for e in entries if not e["cache_hit"] and e.get(field) is not None)
+                for quantile in (0.5, 0.95):
+                    value = percentile(values, quantile)
+                    if value is not None:
+                        if metric_type == "summary":
+                            position = f'quantile="{quantile}"'
+                        else:
+                            position = f'percentile="{quantile * 100:g}"'
+                        lines.append(f'{name}{{model="{label}",{position}}} {value * scale:.6g}')
+                if metric_type == "summary":
+                    totals = self.totals[model]
+                    lines.append(f'{name}_sum{{model="{label}"}} {totals["latency_seconds"]:.6g}')
+                    lines.append(f'{name}_count{{model="{label}"}} {totals["requests"] - totals["cache_hits"]:g}')
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,120 @@
+from datetime import datetime
+
+import customtkinter as ctk
+
+REFRESH_MS = 1000
+
+
+class MetricsWindow:
+    """Per-model rolling p50/p95 of the recorded requests, the latest requests, and app health:
+    UI loop lag, startup times, which models are resident and how much disk they use
+    """
+
+    def __init__(self, parent, metrics, ui=None, startup_timer=None, residency=None, storage=None):
+        self.metrics = metrics
+        self.ui = ui
+        self.startup_timer = startup_timer
+        self.residency = residency
+        self.storage = storage
+        self.window = ctk.CTkToplevel(parent)
+        self.window.title("Generation Metrics")
+        self.window.geometry("900x500")
+        self.window.grid_columnconfigure(0, weight=1)
+        self.window.grid_rowconfigure(0, weight=1)
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.closed = False
+
+        self.textbox = ctk.CTkTextbox(self.window, wrap="none", font=ctk.CTkFont(family="Courier", size=12))
+        self.textbox.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="nsew")
+        export = f"Exported to {metrics.path} ({metrics.fmt})" if metrics.path else "Not exported"
+        ctk.CTkLabel(self.window, text=export, anchor="w").grid(row=1, column=0, padx=10, pady=(0, 10), sticky="w")
+        self.refresh()
+
+    def refresh(self):
+        if self.closed:
+            return
+        self.textbox.configure(state="normal")
+        self.textbox.delete("1.0", "end")
+        self.textbox.insert("end", self.render())
+        self.textbox.configure(state="disabled")
+        self.window.after(REFRESH_MS, self.refresh)
+
+    def render(self):
+        lines = [
+            f"{'Model':<28}{'Reqs':>6}{'Hits':>6}{'TTFT p50/p95 (s)':>20}{'Latency p50/p95 (s)':>22}"
+            f"{'Tok/s p50':>11}{'Prompt p50 (ms)':>17}",
+        ]
+        for model, row in sorted(self.metrics.summary().items()):
+            lines.append(
+                f"{model[:27]:<28}{row['requests']:>6}{row['cache_hits']:>6}"
+                f"{pair(row['ttft_s']):>20}{pair(row['latency_s']):>22}"
+                f"{number(row['tokens_per_s']['p50'], '.1f'):>11}"
+                f"{number(row['prompt_eval_duration']['p50'], '.0f', 1e-6):>17}"
+            )
+        if len(lines) == 1:
+            lines.append("No requests yet")
+
+        lines += ["", "Latest requests", f"{'Time':<10}{'Model':<28}{'Kind':<10}{'TTFT (s)':>10}{'Latency (s)':>13}"
+                  f"{'Prompt tok':>12}{'Gen tok':>9}{'Load (ms)':>11}{'Wait (s)':>10}"]
+        for entry in self.metrics.recent_requests(15):
+            lines.append(
+                f"{datetime.fromtimestamp(entry['time']).strftime('%H:%M:%S'):<10}{entry['model'][:27]:<28}"
+                f"{'cache' if entry['cache_hit'] else entry['kind']:<10}"
+                f"{number(entry['ttft_s'], '.2f'):>10}{number(entry['latency_s'], '.2f'):>13}"
+                f"{number(entry.get('prompt_eval_count'), 'd'):>12}{number(entry.get('eval_count'), 'd'):>9}"
+                f"{number(entry.get('load_duration'), '.0f', 1e-6):>11}"
+                f"{number(entry.get('queue_wait_s'), '.1f'):>10}"
+            )
+
+        if self.ui is not None:
+            ui = self.ui.stats()
+            lines += [
+                "",
+                f"UI queue: {ui['queue_depth']} pending, {ui['max_queue_depth']} max per tick, "
+                f"{ui['coalesced']} of {ui['posted']} updates merged",
+                f"UI loop lag: p50 {ui['lag_ms']:.1f} ms, p95 {ui['p95_lag_ms']:.1f} ms, max {ui['max_lag_ms']:.1f} ms",
+            ]
+        if self.residency is not None:
+            residency = self.residency.stats()
+            budget = residency["budget_bytes"]
+            budget_text = f" of {budget / 1024 ** 3:.1f} GB budget" if budget else ""
+            lines += [
+                "",
+                f"Resident models: {', '.join(residency['resident']) or 'none'} "
+                f"({residency['resident_bytes'] / 1024 ** 3:.1f} GB{budget_text})",
+                f"Loads {residency['loads']}, already resident {residency['skipped_loads']}, "
+                f"evictions {residency['evictions']}, preloads {residency['preloads']}",
+            ]
+        if self.storage is not None and self.storage.report is not None:
+            report = self.storage.report
+            lines += [
+                "",
+                f"Disk: {gigabytes(report['total_bytes'])} GB in {report['root']}, "
+                f"{gigabytes(report['shared_bytes'])} GB shared between models, "
+                f"{gigabytes(report['unreferenced_bytes'])} GB partial or unused",
+                f"{'Model':<40}{'Size (GB)':>11}{'Unique (GB)':>13}{'Shared (GB)':>13}",
+            ]
+            for model, sizes in sorted(report["models"].items(), key=lambda item: -item[1]["size"]):
+                lines.append(f"{model[:39]:<40}{gigabytes(sizes['size']):>11}"
+                             f"{gigabytes(sizes['unique']):>13}{gigabytes(sizes['shared']):>13}")
+        if self.startup_timer is not None:
+            lines += ["", f"Startup: {self.startup_timer.summary()}"]
+        return "\n".join(lines)
+
+    def on_close(self):
+        self.closed = True
+        self.window.destroy()
+
+
+def number(value, fmt, scale=1):
+    if value is None:
+        return "-"
+    return format(value * scale if scale != 1 else value, fmt)
+
+
+def gigabytes(size):
+    return f"{size / 1024 ** 3:.2f}"
+
+
+def pair(quantiles, fmt=".2f"):
+    return f"{number(quantiles['p50'], fmt)} / {number(quantiles['p95'], fmt)}"
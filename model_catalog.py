@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from ollama_client import OllamaError
+
+# Parallel /api/show requests when several models are new or changed
+SHOW_WORKERS = 4
+
+
+def describe(tag, show):
+    """Catalog entry from a model's /api/tags entry and its /api/show response"""
+    details = show.get("details") or tag.get("details") or {}
+    model_info = show.get("model_info") or {}
+    context_length = next((value for key, value in model_info.items() if key.endswith(".context_length")), None)
+    return {
+        "name": tag["name"],
+        "digest": tag.get("digest"),
+        "modified_at": tag.get("modified_at"),
+        "size": tag.get("size", 0),
+        "family": details.get("family"),
+        "parameter_size": details.get("parameter_size"),
+        "parameter_count": model_info.get("general.parameter_count"),
+        "quantization": details.get("quantization_level"),
+        "context_length": context_length,
+        "template": show.get("template"),
+        # False when /api/show failed; the model is asked about again at the next refresh
+        "complete": bool(show),
+    }
+
+
+def summary(model):
+    """Short description of a catalog entry, e.g. "8B, Q4_0, 8192 ctx" """
+    parts = [model.get("parameter_size"), model.get("quantization")]
+    if model.get("context_length"):
+        parts.append(f"{model['context_length']} ctx")
+    return ", ".join(part for part in parts if part) or "no details"
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ModelCatalog:
+    """Installed models with their /api/show details, cached on disk.
+
+    `cached` returns the last known list without asking the server, for
+    filling the model list at startup. `refresh` fetches /api/tags and calls
+    /api/show only for models whose digest or modified time changed since
+    they were cached. Callers that refresh while a refresh is running wait
+    for it and get its result instead of sending their own request.
+    """
+
+    def __init__(self, client, cache_path=None):
+        self.client = client
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.save_lock = threading.Lock()
+        self.models = {}
+        self.load_cache()
+
+    def cached(self):
+        with self.lock:
+            return list(self.models.values())
+
+    def names(self):
+        return [model["name"] for model in self.cached()]
+
+    def get(self, model_name):
+        with self.lock:
+            return self.models.get(model_name)
+
+    def digest(self, model_name):
+        """Digest of an installed model, refreshing the catalog when the model is unknown"""
+        model = self.get(model_name)
+        if model is None:
+            self.refresh()
+            model = self.get(model_name)
+        return model["digest"] if model else None
+
+    def refresh(self):
+        """Fetch the installed models and return their entries, in /api/tags order"""
+        return self.shared("tags", self.fetch)
+
+    def forget(self, model_name):
+        with self.lock:
+            self.models.pop(model_name, None)
+        self.save_cache()
+
+    def shared(self, key, func):
+        """Run func, or wait for the call already running under `key` and share its result"""
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = func()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    def fetch(self):
+        tags = self.client.list_models()
+        with self.lock:
+            known = dict(self.models)
+        changed = [tag for tag in tags if self.is_changed(known.get(tag["name"]), tag)]
+        if changed:
+            with ThreadPoolExecutor(max_workers=min(SHOW_WORKERS, len(changed))) as executor:
+                shows = list(executor.map(self.show, changed))
+            for tag, show in zip(changed, shows):
+                known[tag["name"]] = describe(tag, show)
+        models = {tag["name"]: known[tag["name"]] for tag in tags}
+        with self.lock:
+            removed = set(self.models) - set(models)
+            self.models = models
+        if changed or removed:
+            self.save_cache()
+        return list(models.values())
+
+    def is_changed(self, cached, tag):
+        if cached is None or not cached.get("complete"):
+            return True
+        return (cached["digest"], cached["modified_at"]) != (tag.get("digest"), tag.get("modified_at"))
+
+    def show(self, tag):
+        # A model without /api/show details is still listed, with what /api/tags reported
+        try:
+            return self.client.show(tag["name"])
+        except (requests.exceptions.RequestException, OllamaError):
+            return {}
+
+    def load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                models = json.load(f).get("models", [])
+            self.models = {model["name"]: model for model in models}
+        except (OSError, ValueError, AttributeError, KeyError, TypeError):
+            self.models = {}
+
+    def save_cache(self):
+        if not self.cache_path:
+            return
+        with self.lock:
+            models = list(self.models.values())
+        tmp_path = self.cache_path + ".tmp"
+        with self.save_lock:
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"models": models}, f)
+                os.replace(tmp_path, self.cache_path)
+            except OSError:
+                pass
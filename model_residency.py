@@ -0,0 +1,270 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from ollama_client import OllamaError, max_loaded_models
+
+# How long Ollama keeps the selected model and preloaded models in memory after their last use
+ACTIVE_KEEP_ALIVE = os.environ.get("CHATBOT_KEEP_ALIVE", "30m")
+PRELOAD_KEEP_ALIVE = "10m"
+# Seconds between /api/ps polls, and how old a poll may be before a load decision refreshes it
+POLL_INTERVAL = 5.0
+FRESH_FOR = 1.0
+# A switch must have been seen this often before its target is preloaded
+MIN_SWITCHES_TO_PRELOAD = 2
+# Share of physical memory models may use when CHATBOT_MODEL_RAM_GB is not set
+DEFAULT_RAM_SHARE = 0.75
+
+
+def ram_budget_bytes():
+    """Memory budget for resident models: CHATBOT_MODEL_RAM_GB, else a share of physical RAM"""
+    value = os.environ.get("CHATBOT_MODEL_RAM_GB")
+    if value:
+        try:
+            return int(float(value) * 1024 ** 3)
+        except ValueError:
+            pass
+    try:
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * DEFAULT_RAM_SHARE)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class ResidencyManager:
+    """Keeps track of which models Ollama holds in memory and decides what to load and evict.
+
+    /api/ps is polled in the background, so selecting a model that is
+    already resident costs nothing. Loading a model first unloads the least
+    recently used resident models until it fits in the RAM budget. Every
+    request carries a keep_alive: long for the model in use, shorter for
+    preloaded ones. Each session (a chat tab) has its own active model, so
+    tabs using different models do not take the long keep_alive from each
+    other. Switches within a session are counted (and saved to
+    `history_path`). After a switch, the model most often switched to next
+    is preloaded when it fits without evicting anything.
+    """
+
+    def __init__(self, client, budget_bytes=None, history_path=None, poll_interval=POLL_INTERVAL,
+                 active_keep_alive=ACTIVE_KEEP_ALIVE, preload_keep_alive=PRELOAD_KEEP_ALIVE):
+        self.client = client
+        self.budget_bytes = budget_bytes
+        self.history_path = history_path
+        self.poll_interval = poll_interval
+        self.active_keep_alive = active_keep_alive
+        self.preload_keep_alive = preload_keep_alive
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.history_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.resident = {}
+        self.polled_at = 0.0
+        self.sizes = {}
+        # The model each session used last
+        self.active = {}
+        self.last_used = {}
+        self.switches = defaultdict(lambda: defaultdict(int))
+        self.loads = 0
+        self.skipped_loads = 0
+        self.evictions = 0
+        self.preloads = 0
+        self.load_history()
+
+    def start(self):
+        threading.Thread(target=self.poll_loop, daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def poll_loop(self):
+        while not self.stopped.wait(self.poll_interval):
+            try:
+                self.poll()
+                self.enforce_budget()
+            except (requests.exceptions.RequestException, OllamaError):
+                pass
+
+    def poll(self):
+        models = self.client.running_model_info(timeout=(2, 5))
+        with self.lock:
+            self.resident = {model["name"]: model for model in models}
+            self.polled_at = time.monotonic()
+        return self.resident
+
+    def refresh(self):
+        """Poll /api/ps, ignoring a server that is down"""
+        try:
+            self.poll()
+        except (requests.exceptions.RequestException, OllamaError):
+            pass
+
+    def is_resident(self, model_name):
+        if time.monotonic() - self.polled_at > FRESH_FOR:
+            self.poll()
+        with self.lock:
+            return model_name in self.resident
+
+    def keep_alive(self, model_name):
+        with self.lock:
+            active = model_name in self.active.values()
+        return self.active_keep_alive if active else self.preload_keep_alive
+
+    def touch(self, model_name, session=None):
+        """Record a request to `model_name`; counts a switch when it differs from the session's last model"""
+        with self.lock:
+            previous = self.active.get(session)
+            self.active[session] = model_name
+            self.last_used[model_name] = time.time()
+            if previous and previous != model_name:
+                self.switches[previous][model_name] += 1
+        if previous != model_name:
+            self.save_history()
+
+    def end_session(self, session):
+        with self.lock:
+            self.active.pop(session, None)
+
+    def select(self, model_name, session=None):
+        """Make `model_name` the session's active model and load it if needed; returns True when a load was needed.
+
+        Preloading the model likely to be picked next (`preload_next`) is left to the caller.
+        """
+        self.touch(model_name, session)
+        return self.ensure_loaded(model_name, self.active_keep_alive)
+
+    def ensure_loaded(self, model_name, keep_alive):
+        with self.load_lock:
+            if self.is_resident(model_name):
+                with self.lock:
+                    self.skipped_loads += 1
+                return False
+            self.make_room(self.expected_size(model_name), keep=model_name)
+            self.client.load(model_name, keep_alive=keep_alive)
+            with self.lock:
+                self.loads += 1
+            self.poll()
+            return True
+
+    def expected_size(self, model_name):
+        """Memory a model needs: its last /api/ps size, else its size on disk from /api/tags"""
+        with self.lock:
+            if model_name in self.resident:
+                return self.resident[model_name].get("size", 0)
+            if model_name in self.sizes:
+                return self.sizes[model_name]
+        try:
+            sizes = {model["name"]: model.get("size", 0) for model in self.client.list_models()}
+        except (requests.exceptions.RequestException, OllamaError):
+            return 0
+        with self.lock:
+            self.sizes.update(sizes)
+            return self.sizes.get(model_name, 0)
+
+    def resident_bytes(self):
+        with self.lock:
+            return sum(model.get("size", 0) for model in self.resident.values())
+
+    def make_room(self, needed, keep=None):
+        """Unload least recently used models until `needed` more bytes fit in the budget"""
+        if self.budget_bytes is None:
+            return
+        while self.resident_bytes() + needed > self.budget_bytes:
+            with self.lock:
+                active = set(self.active.values())
+                candidates = [name for name in self.resident if name != keep and name not in active]
+                if not candidates:
+                    return
+                victim = min(candidates, key=lambda name: self.last_used.get(name, 0))
+            self.client.unload(victim)
+            with self.lock:
+                self.resident.pop(victim, None)
+                self.evictions += 1
+
+    def enforce_budget(self):
+        with self.load_lock:
+            self.make_room(0)
+
+    def predict_next(self, model_name):
+        """The model most often switched to from `model_name`, if seen often enough"""
+        with self.lock:
+            following = dict(self.switches.get(model_name, {}))
+        if not following:
+            return None
+        candidate, count = max(following.items(), key=lambda item: item[1])
+        return candidate if count >= MIN_SWITCHES_TO_PRELOAD else None
+
+    def preload_next(self, model_name):
+        candidate = self.predict_next(model_name)
+        if candidate is None:
+            return
+        try:
+            if self.is_resident(candidate):
+                return
+            with self.lock:
+                loaded = len(self.resident)
+            fits = (self.budget_bytes is None or
+                    self.resident_bytes() + self.expected_size(candidate) <= self.budget_bytes)
+            # Only into free room: never evict a model, and never push Ollama past its own limit
+            if not fits or loaded >= max_loaded_models():
+                return
+            with self.load_lock:
+                self.client.load(candidate, keep_alive=self.preload_keep_alive)
+            with self.lock:
+                self.preloads += 1
+            self.poll()
+        except (requests.exceptions.RequestException, OllamaError):
+            pass
+
+    def forget(self, model_name):
+        with self.lock:
+            self.resident.pop(model_name, None)
+            self.sizes.pop(model_name, None)
+            self.last_used.pop(model_name, None)
+            self.switches.pop(model_name, None)
+            for following in self.switches.values():
+                following.pop(model_name, None)
+        self.save_history()
+
+    def load_history(self):
+        if not self.history_path or not os.path.exists(self.history_path):
+            return
+        try:
+            with open(self.history_path, encoding="utf-8") as f:
+                history = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.last_used.update(history.get("last_used", {}))
+        for source, following in history.get("switches", {}).items():
+            self.switches[source].update(following)
+
+    def save_history(self):
+        if not self.history_path:
+            return
+        with self.lock:
+            history = {
+                "last_used": dict(self.last_used),
+                "switches": {source: dict(following) for source, following in self.switches.items()},
+            }
+        tmp_path = self.history_path + ".tmp"
+        with self.history_lock:
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(history, f)
+                os.replace(tmp_path, self.history_path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "resident": sorted(self.resident),
+                "resident_bytes": sum(model.get("size", 0) for model in self.resident.values()),
+                "budget_bytes": self.budget_bytes,
+                "loads": self.loads,
+                "skipped_loads": self.skipped_loads,
+                "evictions": self.evictions,
+                "preloads": self.preloads,
+            }
@@ -0,0 +1,203 @@
+import json
+import os
+import sys
+import threading
+
+DEFAULT_REGISTRY = "registry.ollama.ai"
+DEFAULT_NAMESPACE = "library"
+
+
+def model_store_dirs():
+    """Where Ollama may keep its models: OLLAMA_MODELS, else the user's and the system service's store"""
+    configured = os.environ.get("OLLAMA_MODELS")
+    if configured:
+        return [os.path.expanduser(configured)]
+    dirs = [os.path.join(os.path.expanduser("~"), ".ollama", "models")]
+    if sys.platform == "linux":
+        # The Linux install script runs the server as the ollama user
+        dirs.append("/usr/share/ollama/.ollama/models")
+    return dirs
+
+
+def find_model_store():
+    for path in model_store_dirs():
+        if os.path.isdir(os.path.join(path, "manifests")) or os.path.isdir(os.path.join(path, "blobs")):
+            return path
+    return None
+
+
+def blob_name(digest):
+    # Blob files are named sha256-<hex>; old stores used sha256:<hex>
+    return digest.replace(":", "-")
+
+
+def model_name(parts):
+    """Model name for the manifest at manifests/<registry>/<namespace>/<model>/<tag>"""
+    if len(parts) < 4:
+        return "/".join(parts)
+    registry, namespace, model, tag = parts[-4], parts[-3], parts[-2], parts[-1]
+    name = model
+    if namespace != DEFAULT_NAMESPACE or registry != DEFAULT_REGISTRY:
+        name = f"{namespace}/{name}"
+    if registry != DEFAULT_REGISTRY:
+        name = f"{registry}/{name}"
+    return f"{name}:{tag}"
+
+
+class ModelStorage:
+    """Disk usage of the Ollama model store, split by model.
+
+    The store is walked with os.scandir. A directory whose mtime is
+    unchanged since the last scan keeps its cached listing, and a manifest
+    whose mtime and size are unchanged keeps its parsed layers, so a rescan
+    only stats the directories (the cache is saved to `cache_path` and
+    survives restarts). Each blob counts once towards the total; a model's
+    size is the sum of the blobs its manifest lists, of which the part used
+    by no other model is its unique size.
+    """
+
+    def __init__(self, root=None, cache_path=None):
+        self.root = root
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self.dirs = {}
+        self.manifests = {}
+        self.report = None
+        self.seen = set()
+        self.dirty = False
+        self.load_cache()
+
+    def scan(self):
+        """Walk the store and return the report; safe to call from any thread"""
+        with self.lock:
+            root = self.root or find_model_store()
+            if root is None:
+                self.report = None
+                return None
+            self.seen = set()
+            blobs = self.files(os.path.join(root, "blobs"))
+            manifests = {}
+            self.walk_manifests(os.path.join(root, "manifests"), [], manifests)
+            self.report = self.build_report(root, blobs, manifests)
+            self.prune()
+            if self.dirty:
+                self.save_cache()
+            return self.report
+
+    def listing(self, path):
+        """(files {name: size}, subdirectories) of `path`, from the cache while its mtime is unchanged"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return {}, []
+        self.seen.add(path)
+        cached = self.dirs.get(path)
+        if cached is not None and cached["mtime"] == mtime:
+            return cached["files"], cached["subdirs"]
+        files, subdirs = {}, []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file():
+                        files[entry.name] = entry.stat().st_size
+                except OSError:
+                    continue
+        self.dirs[path] = {"mtime": mtime, "files": files, "subdirs": subdirs}
+        self.dirty = True
+        return files, subdirs
+
+    def files(self, path):
+        return self.listing(path)[0]
+
+    def walk_manifests(self, path, parts, manifests):
+        files, subdirs = self.listing(path)
+        for name in files:
+            manifest = self.read_manifest(os.path.join(path, name))
+            if manifest is not None:
+                manifests[model_name(parts + [name])] = manifest
+        for name in subdirs:
+            self.walk_manifests(os.path.join(path, name), parts + [name], manifests)
+
+    def read_manifest(self, path):
+        """{blob digest: size} of a manifest, reparsed only when its mtime or size changed"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        self.seen.add(path)
+        key = [stat.st_mtime_ns, stat.st_size]
+        cached = self.manifests.get(path)
+        if cached is not None and cached["key"] == key:
+            return cached["layers"]
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            layers = {}
+            for layer in [data.get("config")] + list(data.get("layers", [])):
+                if layer and layer.get("digest"):
+                    layers[layer["digest"]] = layer.get("size", 0)
+        except (OSError, ValueError, AttributeError, TypeError):
+            return None
+        self.manifests[path] = {"key": key, "layers": layers}
+        self.dirty = True
+        return layers
+
+    def prune(self):
+        # Forget directories and manifests that were deleted since the last scan
+        for cache in (self.dirs, self.manifests):
+            for path in [path for path in cache if path not in self.seen]:
+                del cache[path]
+                self.dirty = True
+
+    def build_report(self, root, blobs, manifests):
+        users = {}
+        for name, layers in manifests.items():
+            for digest in layers:
+                users.setdefault(digest, []).append(name)
+
+        models = {}
+        for name, layers in manifests.items():
+            size = unique = 0
+            for digest, listed_size in layers.items():
+                on_disk = blobs.get(blob_name(digest), listed_size)
+                size += on_disk
+                if len(users[digest]) == 1:
+                    unique += on_disk
+            models[name] = {"size": size, "unique": unique, "shared": size - unique}
+
+        referenced = {blob_name(digest) for digest in users}
+        total = sum(blobs.values())
+        shared = sum(blobs.get(blob_name(digest), 0) for digest, names in users.items() if len(names) > 1)
+        return {
+            "root": root,
+            "total_bytes": total,
+            "shared_bytes": shared,
+            # Partial downloads and layers no model uses any more
+            "unreferenced_bytes": sum(size for name, size in blobs.items() if name not in referenced),
+            "models": models,
+        }
+
+    def load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                cache = json.load(f)
+            self.dirs = dict(cache.get("dirs", {}))
+            self.manifests = dict(cache.get("manifests", {}))
+        except (OSError, ValueError, AttributeError):
+            self.dirs, self.manifests = {}, {}
+
+    def save_cache(self):
+        if not self.cache_path:
+            return
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"dirs": self.dirs, "manifests": self.manifests}, f)
+            os.replace(tmp_path, self.cache_path)
+            self.dirty = False
+        except OSError:
+            pass
@@ -0,0 +1,301 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_BASE_URL = "http://localhost:11434"
+
+
+def default_base_url():
+    """Base URL from OLLAMA_HOST (same variable the ollama CLI uses), else localhost"""
+    host = os.environ.get("OLLAMA_HOST", "").strip()
+    if not host:
+        return DEFAULT_BASE_URL
+    return normalize_host(host)
+
+
+def normalize_host(host):
+    """Base URL for "host", "host:port" or a full URL, with Ollama's default port"""
+    host = host.strip()
+    if "://" not in host:
+        host = f"http://{host}" if ":" in host else f"http://{host}:11434"
+    return host.rstrip("/")
+
+
+def max_loaded_models():
+    """Models the server keeps in memory at once (OLLAMA_MAX_LOADED_MODELS, 3 by default on CPU)"""
+    try:
+        return max(1, int(os.environ.get("OLLAMA_MAX_LOADED_MODELS", "3")))
+    except ValueError:
+        return 3
+
+
+def num_parallel():
+    """Requests the server answers at once per model (OLLAMA_NUM_PARALLEL, 1 when not set)"""
+    try:
+        return max(1, int(os.environ.get("OLLAMA_NUM_PARALLEL", "1")))
+    except ValueError:
+        return 1
+
+
+class OllamaError(Exception):
+    pass
+
+
+class Cancellation:
+    """Aborts a streamed request from another thread.
+
+    The request attaches its response once the server starts answering;
+    `cancel` closes it, which drops the connection and makes Ollama stop
+    the generation or pull. A response attached after `cancel` is closed
+    right away.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.response = None
+
+    def is_set(self):
+        return self.cancelled.is_set()
+
+    def attach(self, response):
+        with self.lock:
+            self.response = response
+            cancelled = self.cancelled.is_set()
+        if cancelled:
+            response.close()
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled.set()
+            response = self.response
+        if response is not None:
+            response.close()
+
+
+class OllamaClient:
+    """Shared HTTP client for the Ollama API.
+
+    Connections are kept alive in a pool shared by every call site, every request
+    has separate connect and read timeouts, and idempotent (GET/HEAD/DELETE)
+    requests are retried with exponential backoff.
+    """
+
+    def __init__(self, base_url=None, connect_timeout=3.05, read_timeout=300,
+                 retries=3, backoff_factor=0.3, pool_size=10):
+        self.base_url = (base_url or default_base_url()).rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            allowed_methods=frozenset(["GET", "HEAD", "DELETE"]),
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def request(self, method, path, timeout=None, **kwargs):
+        return self.session.request(method, self.url(path), timeout=timeout or self.timeout, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def is_running(self, timeout=2):
+        try:
+            return self.get("/", timeout=(timeout, timeout)).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def list_models(self):
+        """Return the model entries from /api/tags"""
+        response = self.get("/api/tags")
+        check_response(response)
+        return response.json().get("models", [])
+
+    def show(self, model_name):
+        """Return /api/show for a model: its details, model_info, parameters and template"""
+        response = self.post("/api/show", json={"model": model_name})
+        check_response(response)
+        return response.json()
+
+    def chat(self, model_name, messages, stats=None, stream=True, options=None, keep_alive=None, cancel=None):
+        """Yield answer chunks from /api/chat and fill stats from the final response.
+
+        A `cancel` Cancellation stops the answer early; the generator then just ends.
+        """
+        payload = {"model": model_name, "messages": messages, "stream": stream}
+        if options:
+            payload["options"] = options
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        with self.post("/api/chat", json=payload, stream=stream) as response:
+            if cancel is not None:
+                cancel.attach(response)
+            check_response(response)
+            try:
+                for data in iter_json_lines(response, stream):
+                    content = data.get("message", {}).get("content", "")
+                    if content:
+                        yield content
+                    if data.get("done") and stats is not None:
+                        stats.update({k: v for k, v in data.items() if k.endswith(("_count", "_duration"))})
+                    if cancel is not None and cancel.is_set():
+                        return
+            except Exception:
+                # Reading a response closed by cancel() fails; that is the expected way out
+                if cancel is not None and cancel.is_set():
+                    return
+                raise
+
+    def embed(self, model_name, text):
+        """Return the embedding of `text` from /api/embed"""
+        response = self.post("/api/embed", json={"model": model_name, "input": text})
+        check_response(response)
+        return response.json()["embeddings"][0]
+
+    def running_model_info(self, timeout=None):
+        """Return the /api/ps entries (name, size, size_vram, expires_at) of the loaded models"""
+        response = self.get("/api/ps", timeout=timeout)
+        check_response(response)
+        return response.json().get("models", [])
+
+    def running_models(self, timeout=None):
+        """Return the names of the models currently loaded in memory (/api/ps)"""
+        return [model["name"] for model in self.running_model_info(timeout)]
+
+    def load(self, model_name, keep_alive=None):
+        """Load a model into memory without generating anything"""
+        payload = {"model": model_name}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        response = self.post("/api/generate", json=payload)
+        check_response(response)
+
+    def unload(self, model_name, timeout=None):
+        """Evict a model from memory by asking for a zero keep-alive"""
+        response = self.post("/api/generate", json={"model": model_name, "keep_alive": 0}, timeout=timeout)
+        check_response(response)
+
+    def delete(self, model_name):
+        response = self.request("DELETE", "/api/delete", json={"model": model_name})
+        check_response(response)
+
+    def unload_running(self, deadline=3.0):
+        """Unload every loaded model concurrently, giving up once the deadline passes.
+
+        Returns the names of the models that were confirmed unloaded.
+        """
+        end = time.monotonic() + deadline
+        try:
+            # A single attempt: the session's retries would wait out a server that never answers
+            response = requests.get(self.url("/api/ps"), timeout=(deadline, deadline))
+            check_response(response)
+            models = [model["name"] for model in response.json().get("models", [])]
+        except (requests.exceptions.RequestException, OllamaError, ValueError, AttributeError, KeyError):
+            return []
+        remaining = end - time.monotonic()
+        if not models or remaining <= 0:
+            return []
+
+        executor = ThreadPoolExecutor(max_workers=len(models))
+        futures = {executor.submit(self.unload, name, (remaining, remaining)): name for name in models}
+        done, _ = wait(futures, timeout=remaining)
+        executor.shutdown(wait=False, cancel_futures=True)
+        return [futures[f] for f in done if f.exception() is None]
+
+    def pull(self, model_name, cancel=None):
+        """Yield progress updates from /api/pull; a `cancel` Cancellation stops the pull early"""
+        with self.post("/api/pull", json={"name": model_name, "stream": True}, stream=True) as response:
+            if cancel is not None:
+                cancel.attach(response)
+            check_response(response)
+            try:
+                for data in iter_json_lines(response, stream=True):
+                    yield data
+                    if cancel is not None and cancel.is_set():
+                        return
+            except Exception:
+                if cancel is not None and cancel.is_set():
+                    return
+                raise
+
+
+class AsyncOllamaClient:
+    """httpx counterpart of OllamaClient for the calls made on the I/O loop.
+
+    Unloading and removing a model concern every server, so both are sent to
+    all `base_urls` at once: one URL for a single server, every node behind
+    an OllamaRouter. Cancelling the task awaiting a call closes its
+    connections, so the server stops working on it.
+    """
+
+    def __init__(self, base_urls=None, connect_timeout=3.05, read_timeout=300, retries=3, pool_size=10):
+        self.base_urls = [url.rstrip("/") for url in (base_urls or [default_base_url()])]
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            # Only connection attempts are retried; a request the server received is not sent twice
+            transport=httpx.AsyncHTTPTransport(retries=retries),
+        )
+
+    async def request(self, method, base_url, path, **kwargs):
+        response = await self.client.request(method, f"{base_url}{path}", **kwargs)
+        check_response(response)
+        return response
+
+    async def each(self, method, path, payload):
+        """Send the request to every server; raises only when none of them accepted it"""
+        results = await asyncio.gather(*(self.request(method, url, path, json=payload) for url in self.base_urls),
+                                       return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if len(errors) == len(results):
+            raise errors[0]
+        return len(results) - len(errors)
+
+    async def unload(self, model_name):
+        """Evict a model from memory by asking for a zero keep-alive"""
+        await self.each("POST", "/api/generate", {"model": model_name, "keep_alive": 0})
+
+    async def delete(self, model_name):
+        await self.each("DELETE", "/api/delete", {"model": model_name})
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def check_response(response):
+    if response.status_code == 200:
+        return
+    try:
+        message = response.json().get("error", response.text)
+    except ValueError:
+        message = response.text
+    raise OllamaError(message or f"HTTP {response.status_code}")
+
+
+def iter_json_lines(response, stream):
+    lines = response.iter_lines() if stream else [response.content]
+    for line in lines:
+        if not line:
+            continue
+        data = json.loads(line.decode('utf-8'))
+        if "error" in data:
+            raise OllamaError(data["error"])
+        yield data
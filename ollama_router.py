@@ -0,0 +1,339 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from ollama_client import OllamaClient, OllamaError, default_base_url, normalize_host
+
+# Seconds between health checks of every node
+HEALTH_INTERVAL = 5.0
+# A node that does not answer a health check within this many seconds counts as down
+HEALTH_TIMEOUT = 2.0
+# Errors that mean the node itself is unreachable or went away mid-answer, so another node may answer instead
+NODE_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+               requests.exceptions.Timeout)
+
+
+def configured_hosts():
+    """Base URLs from OLLAMA_HOSTS (comma-separated), else the single OLLAMA_HOST"""
+    hosts = [host for host in os.environ.get("OLLAMA_HOSTS", "").split(",") if host.strip()]
+    if not hosts:
+        return [default_base_url()]
+    return [normalize_host(host) for host in hosts]
+
+
+def make_client(hosts=None, **kwargs):
+    """An OllamaClient for a single host, or an OllamaRouter spreading requests over several"""
+    hosts = hosts or configured_hosts()
+    if len(hosts) == 1:
+        return OllamaClient(hosts[0], **kwargs)
+    return OllamaRouter(hosts, **kwargs)
+
+
+def node_count(client):
+    return len(client.nodes) if isinstance(client, OllamaRouter) else 1
+
+
+def base_urls(client):
+    """Every server behind `client`"""
+    if isinstance(client, OllamaRouter):
+        return [node.client.base_url for node in client.nodes]
+    return [client.base_url]
+
+
+def check_nodes(client):
+    """Check every node of a router now, e.g. right after starting a server, instead of at the next health check"""
+    if isinstance(client, OllamaRouter):
+        client.check_all()
+
+
+class Node:
+    """One Ollama server with what its last health check found"""
+
+    def __init__(self, client):
+        self.client = client
+        self.healthy = True
+        self.checked = False
+        # Models loaded in memory (/api/ps) and installed (/api/tags)
+        self.resident = set()
+        self.installed = None
+        self.in_flight = 0
+        # Requests in flight per model, whose model may still be loading and missing from /api/ps
+        self.requests = {}
+        self.error = None
+
+    def has_model(self, model_name):
+        return self.installed is None or model_name in self.installed
+
+
+class OllamaRouter:
+    """Spreads requests over several Ollama servers, with the OllamaClient interface.
+
+    Every node is health-checked in the background through /api/ps and
+    /api/tags, which also tell which models it has loaded and installed. A
+    request for a model goes to the healthy node with the fewest requests in
+    flight among those that already have the model in memory, else among
+    those that have it installed; the model then counts as resident there,
+    so later requests follow it instead of loading it on every node. A
+    request that cannot reach its node is sent to the next one and the node
+    is marked down until a health check finds it again. A streamed answer
+    that breaks after its first chunk cannot be moved and fails.
+    """
+
+    def __init__(self, hosts, interval=HEALTH_INTERVAL, **kwargs):
+        self.nodes = [Node(OllamaClient(host, **kwargs)) for host in hosts]
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.watcher = None
+
+    @property
+    def base_url(self):
+        # Used where a single server is needed: LangChain chains and starting `ollama serve`
+        return self.nodes[0].client.base_url
+
+    def url(self, path):
+        return self.nodes[0].client.url(path)
+
+    def start(self):
+        """Check every node now, then keep checking them in the background"""
+        with self.lock:
+            if self.watcher is not None:
+                return
+            self.watcher = threading.Thread(target=self.watch, daemon=True)
+        self.check_all()
+        self.watcher.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def watch(self):
+        while not self.stopped.wait(self.interval):
+            self.check_all()
+
+    def check_all(self):
+        with ThreadPoolExecutor(max_workers=len(self.nodes)) as executor:
+            list(executor.map(self.check, self.nodes))
+
+    def check(self, node):
+        """One attempt per endpoint without the client's retries, which would wait out a node that is down"""
+        timeout = (HEALTH_TIMEOUT, HEALTH_TIMEOUT)
+        try:
+            running = requests.get(node.client.url("/api/ps"), timeout=timeout)
+            tags = requests.get(node.client.url("/api/tags"), timeout=timeout)
+            resident = {model["name"] for model in running.json().get("models", [])}
+            installed = {model["name"] for model in tags.json().get("models", [])}
+            healthy = running.status_code == 200 and tags.status_code == 200
+        except (requests.exceptions.RequestException, ValueError, AttributeError, KeyError) as e:
+            self.mark_down(node, e)
+            return
+        with self.lock:
+            node.checked = True
+            node.healthy = healthy
+            node.error = None if healthy else f"HTTP {running.status_code}/{tags.status_code}"
+            node.resident = resident | {name for name in node.requests if name} if healthy else set()
+            node.installed = installed if healthy else None
+
+    def mark_down(self, node, error):
+        with self.lock:
+            node.checked = True
+            node.healthy = False
+            node.error = str(error)
+            node.resident = set()
+
+    def node_errors(self):
+        errors = "; ".join(f"{node.client.base_url}: {node.error}" for node in self.nodes if node.error)
+        return f" ({errors})" if errors else ""
+
+    def healthy_nodes(self):
+        self.start()
+        with self.lock:
+            return [node for node in self.nodes if node.healthy]
+
+    def acquire(self, model_name, tried, loads=True):
+        """Pick the node for a request and count it as in flight there.
+
+        A request that `loads` the model (chat, embed, load) also
+        counts the model as resident on that node; others, like show, do not.
+        """
+        self.start()
+        with self.lock:
+            candidates = [node for node in self.nodes if node.healthy and node not in tried]
+            if model_name is not None:
+                candidates = ([node for node in candidates if model_name in node.resident]
+                              or [node for node in candidates if node.has_model(model_name)])
+            if not candidates:
+                raise OllamaError(f"No Ollama node can take a request for {model_name}{self.node_errors()}")
+            node = min(candidates, key=lambda n: (n.in_flight, len(n.resident)))
+            node.in_flight += 1
+            if loads:
+                node.requests[model_name] = node.requests.get(model_name, 0) + 1
+                if model_name is not None:
+                    node.resident.add(model_name)
+            return node
+
+    def release(self, node, model_name, loads=True):
+        with self.lock:
+            node.in_flight -= 1
+            if loads:
+                node.requests[model_name] -= 1
+                if not node.requests[model_name]:
+                    del node.requests[model_name]
+
+    def routed(self, model_name, method, *args, loads=True, **kwargs):
+        """Call `method` on the chosen node, moving on to the next node while nodes are unreachable"""
+        tried = []
+        while True:
+            node = self.acquire(model_name, tried, loads)
+            try:
+                return getattr(node.client, method)(*args, **kwargs)
+            except NODE_ERRORS as e:
+                self.mark_down(node, e)
+                tried.append(node)
+            finally:
+                self.release(node, model_name, loads)
+
+    def each_node(self, method, *args, **kwargs):
+        """Call `method` on every healthy node; returns the results, raising when every node failed or none is up"""
+        nodes = self.healthy_nodes()
+        if not nodes:
+            # Like a single OllamaClient that cannot connect: an empty answer would look like "no models"
+            raise OllamaError(f"No Ollama node is reachable{self.node_errors()}")
+        results, error = [], None
+        for node in nodes:
+            try:
+                results.append(getattr(node.client, method)(*args, **kwargs))
+            except NODE_ERRORS as e:
+                self.mark_down(node, e)
+                error = e
+            except OllamaError as e:
+                error = e
+        if not results and error is not None:
+            raise error
+        return results
+
+    def is_running(self, timeout=2):
+        return any(node.client.is_running(timeout) for node in self.healthy_nodes())
+
+    def list_models(self):
+        """The /api/tags entries of every healthy node, each model listed once"""
+        return unique_by_name(self.each_node("list_models"))
+
+    def show(self, model_name):
+        # Reads the model's files without loading it
+        return self.routed(model_name, "show", model_name, loads=False)
+
+    def embed(self, model_name, text):
+        return self.routed(model_name, "embed", model_name, text)
+
+    def load(self, model_name, keep_alive=None):
+        return self.routed(model_name, "load", model_name, keep_alive=keep_alive)
+
+    def chat(self, model_name, messages, stats=None, stream=True, options=None, keep_alive=None, cancel=None):
+        """Yield answer chunks from the chosen node, failing over while no chunk has arrived yet"""
+        tried = []
+        while True:
+            node = self.acquire(model_name, tried)
+            chunks = node.client.chat(model_name, messages, stats, stream, options=options,
+                                      keep_alive=keep_alive, cancel=cancel)
+            started = False
+            try:
+                for chunk in chunks:
+                    started = True
+                    yield chunk
+                return
+            except NODE_ERRORS as e:
+                self.mark_down(node, e)
+                if started:
+                    raise
+                tried.append(node)
+            finally:
+                chunks.close()
+                self.release(node, model_name)
+
+    def running_model_info(self, timeout=None):
+        return unique_by_name(self.each_node("running_model_info", timeout))
+
+    def running_models(self, timeout=None):
+        return [model["name"] for model in self.running_model_info(timeout)]
+
+    def unload(self, model_name, timeout=None):
+        """Unload the model from every node that has it in memory"""
+        with self.lock:
+            nodes = [node for node in self.nodes if node.healthy and model_name in node.resident]
+        for node in nodes:
+            try:
+                node.client.unload(model_name, timeout=timeout)
+            except NODE_ERRORS as e:
+                self.mark_down(node, e)
+                continue
+            with self.lock:
+                node.resident.discard(model_name)
+
+    def delete(self, model_name):
+        self.each_node("delete", model_name)
+        with self.lock:
+            for node in self.nodes:
+                node.resident.discard(model_name)
+                if node.installed is not None:
+                    node.installed.discard(model_name)
+
+    def unload_running(self, deadline=3.0):
+        nodes = self.healthy_nodes()
+        if not nodes:
+            return []
+        with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+            unloaded = executor.map(lambda node: node.client.unload_running(deadline), nodes)
+        return sorted({name for names in unloaded for name in names})
+
+    def pull(self, model_name, cancel=None):
+        """Pull the model onto every healthy node in turn, as one pull.
+
+        Layer digests are prefixed with the node, so the progress of every node
+        adds up instead of starting the same layers over from zero. A layer seen
+        on the first node is announced at once for the others, so the total is
+        known up front and the progress never jumps back. Only the last node's
+        "success" is passed on.
+        """
+        nodes = self.healthy_nodes()
+        if not nodes:
+            raise OllamaError("No Ollama node is reachable")
+        announced = set()
+        for i, node in enumerate(nodes):
+            for data in node.client.pull(model_name, cancel=cancel):
+                if data.get("status") == "success" and i < len(nodes) - 1:
+                    continue
+                digest = data.get("digest")
+                if digest:
+                    if digest not in announced and data.get("total"):
+                        announced.add(digest)
+                        for later in nodes[i + 1:]:
+                            yield {"status": data.get("status", ""), "total": data["total"], "completed": 0,
+                                   "digest": f"{later.client.base_url} {digest}"}
+                    data = {**data, "digest": f"{node.client.base_url} {digest}"}
+                yield data
+            if cancel is not None and cancel.is_set():
+                return
+            with self.lock:
+                if node.installed is not None:
+                    node.installed.add(model_name)
+
+    def stats(self):
+        """Per node: its URL, whether it is up, requests in flight and the models in memory"""
+        with self.lock:
+            return [{
+                "url": node.client.base_url,
+                "healthy": node.healthy,
+                "in_flight": node.in_flight,
+                "resident": sorted(node.resident),
+                "error": node.error,
+            } for node in self.nodes]
+
+
+def unique_by_name(lists):
+    models = {}
+    for entries in lists:
+        for entry in entries:
+            models.setdefault(entry["name"], entry)
+    return list(models.values())
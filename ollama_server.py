@@ -0,0 +1,138 @@
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+import requests
+
+# Total time a freshly started server gets to answer before startup is reported as failed
+START_DEADLINE = 60.0
+# Readiness probe delays: start short and double up to the cap
+FIRST_PROBE_DELAY = 0.05
+MAX_PROBE_DELAY = 1.0
+OUTPUT_LINES_KEPT = 20
+# How often the server's log is read for its "Listening on" line while waiting
+LOG_POLL_INTERVAL = 0.05
+
+LISTENING = re.compile(r"listening on", re.IGNORECASE)
+# Another server owns the port; it may still be starting, so keep probing it
+ADDRESS_IN_USE = re.compile(r"address already in use|only one usage of each socket address", re.IGNORECASE)
+
+
+class OllamaServer:
+    """Starts `ollama serve` and waits until it answers.
+
+    The server writes its output to `log_path` (or nowhere), never to a pipe
+    of ours: it may keep running after the app exits, and a server writing
+    to a closed pipe would be killed. While waiting, the HTTP endpoint is
+    probed with exponential backoff until the deadline, and the log is read
+    for the "Listening on" line, which triggers a probe at once. The process
+    exiting wakes the waiting thread right away.
+    """
+
+    def __init__(self, client, command=("ollama", "serve"), log_path=None):
+        self.client = client
+        self.command = list(command)
+        self.log_path = log_path
+        self.log_offset = 0
+        self.process = None
+        self.output = deque(maxlen=OUTPUT_LINES_KEPT)
+        self.exited = threading.Event()
+        self.listening = False
+        self.address_in_use = False
+
+    def start(self, deadline=START_DEADLINE):
+        """Start the server and wait for it; returns (ready, reason when not ready)"""
+        kwargs = {}
+        if sys.platform == "win32":
+            kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+        log = self.open_log()
+        try:
+            self.process = subprocess.Popen(self.command, stdout=log, stderr=subprocess.STDOUT, **kwargs)
+        except FileNotFoundError:
+            return False, f"{self.command[0]} was not found. Make sure Ollama is installed."
+        finally:
+            # The server holds its own handle on the log
+            if log is not subprocess.DEVNULL:
+                log.close()
+        threading.Thread(target=self.watch_exit, daemon=True).start()
+        return self.wait_until_ready(deadline)
+
+    def open_log(self):
+        if not self.log_path:
+            return subprocess.DEVNULL
+        try:
+            log = open(self.log_path, "wb")
+        except OSError:
+            return subprocess.DEVNULL
+        self.log_offset = 0
+        return log
+
+    def watch_exit(self):
+        self.process.wait()
+        self.exited.set()
+
+    def read_log(self):
+        """Take in the complete lines the server logged since the last call"""
+        if not self.log_path:
+            return
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(self.log_offset)
+                data = f.read()
+        except OSError:
+            return
+        end = data.rfind(b"\n") + 1
+        self.log_offset += end
+        for line in data[:end].decode("utf-8", errors="replace").splitlines():
+            line = line.rstrip()
+            if not line:
+                continue
+            self.output.append(line)
+            if LISTENING.search(line):
+                self.listening = True
+            elif ADDRESS_IN_USE.search(line):
+                self.address_in_use = True
+
+    def wait_until_ready(self, deadline):
+        end = time.monotonic() + deadline
+        delay = FIRST_PROBE_DELAY
+        next_probe = 0.0
+        while True:
+            if time.monotonic() >= next_probe:
+                if self.probe(min(2, max(0.1, end - time.monotonic()))):
+                    return True, None
+                next_probe = time.monotonic() + delay
+                delay = min(delay * 2, MAX_PROBE_DELAY)
+            exited = self.process.poll() is not None
+            listening = self.listening
+            self.read_log()
+            if exited and not self.address_in_use:
+                return False, self.crash_reason()
+            if self.listening and not listening:
+                # Listening: probe again at once
+                next_probe = 0.0
+                continue
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return False, f"Ollama did not answer within {deadline:g}s"
+            timeout = min(LOG_POLL_INTERVAL, max(0.0, next_probe - time.monotonic()), remaining)
+            if exited:
+                # Exited while another server owns the port: keep probing that one
+                time.sleep(timeout)
+            else:
+                self.exited.wait(timeout)
+
+    def probe(self, timeout):
+        """One attempt without the client's retries, which would sleep between refused connections"""
+        try:
+            return requests.get(self.client.url("/"), timeout=(timeout, timeout)).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def crash_reason(self):
+        last_lines = "\n".join(list(self.output)[-5:])
+        reason = f"ollama serve exited with code {self.process.returncode}"
+        return f"{reason}:\n{last_lines}" if last_lines else reason
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import deque
+
+from ollama_client import Cancellation, max_loaded_models, num_parallel
+
+# Finished requests whose queue wait is averaged
+WAIT_WINDOW = 20
+# How often a request waiting for a generation slot checks whether it was cancelled
+CANCEL_POLL = 0.1
+
+
+class QueuedRequest:
+    """A message waiting for or getting its answer, with the settings it was sent with"""
+
+    def __init__(self, message, model_name, settings):
+        self.message = message
+        self.model_name = model_name
+        self.settings = settings
+        self.cancel = Cancellation()
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+
+    def wait_s(self):
+        """Seconds spent in the queue so far, or in total once the request started"""
+        return (self.started_at or time.monotonic()) - self.enqueued_at
+
+
+class GenerationScheduler:
+    """Generation slots shared by every session, within the server's own limits:
+    OLLAMA_NUM_PARALLEL requests per model and OLLAMA_MAX_LOADED_MODELS models
+    at once. Requests past them would only wait inside Ollama, where they can
+    be neither seen nor stopped.
+    """
+
+    def __init__(self, parallel=None, max_models=None):
+        self.parallel = parallel or num_parallel()
+        self.max_models = max_models or max_loaded_models()
+        self.condition = threading.Condition()
+        self.active = {}
+        # Waiting requests in arrival order, so a tab that just finished an answer
+        # cannot take the slot again ahead of a tab that was already waiting
+        self.waiting = []
+
+    def acquire(self, model_name, cancel=None, background=False):
+        """Wait for a slot for `model_name`; returns False when `cancel` was set first.
+
+        A `background` request (a history summary) only gets a slot while no
+        other request is waiting, so it never delays an answer.
+        """
+        ticket = (object(), model_name, background)
+        with self.condition:
+            self.waiting.append(ticket)
+            try:
+                while not self.is_next(ticket):
+                    if cancel is not None and cancel.is_set():
+                        return False
+                    self.condition.wait(CANCEL_POLL)
+                self.active[model_name] = self.active.get(model_name, 0) + 1
+                return True
+            finally:
+                self.waiting.remove(ticket)
+                self.condition.notify_all()
+
+    def is_next(self, ticket):
+        """Whether `ticket` is the earliest waiting request that a slot is free for"""
+        interactive = [waiting for waiting in self.waiting if not waiting[2]]
+        for waiting in interactive or self.waiting:
+            if self.can_start(waiting[1]):
+                return waiting is ticket
+        return False
+
+    def can_start(self, model_name):
+        running = self.active.get(model_name, 0)
+        if running:
+            return running < self.parallel
+        return len(self.active) < self.max_models
+
+    def release(self, model_name):
+        with self.condition:
+            self.active[model_name] -= 1
+            if not self.active[model_name]:
+                del self.active[model_name]
+            self.condition.notify_all()
+
+    def stats(self):
+        with self.condition:
+            return {"generating": sum(self.active.values()), "models": dict(self.active), "waiting": len(self.waiting)}
+
+
+class RequestQueue:
+    """A session's messages, answered one at a time in the order they were sent.
+
+    Each answer needs the ones before it in the history, so a message sent
+    while an answer is generating waits instead of being rejected. With a
+    `scheduler`, each request also waits for a generation slot shared with
+    the other sessions. `handle` runs on the queue's worker thread with each
+    request (also one cancelled while it waited for a slot); `on_change` is
+    called whenever a request is queued, started or finished, and `on_idle`
+    on the worker thread once the last queued request is done.
+    """
+
+    def __init__(self, handle, on_change=None, scheduler=None, on_idle=None):
+        self.handle = handle
+        self.on_change = on_change
+        self.on_idle = on_idle
+        self.scheduler = scheduler
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.current = None
+        self.running = False
+        self.waits = deque(maxlen=WAIT_WINDOW)
+
+    def submit(self, message, model_name, settings):
+        request = QueuedRequest(message, model_name, settings)
+        with self.lock:
+            self.pending.append(request)
+            start = not self.running
+            self.running = True
+        if start:
+            threading.Thread(target=self.work, daemon=True).start()
+        self.changed()
+        return request
+
+    def work(self):
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.current = None
+                    self.running = False
+                    break
+                request = self.current = self.pending.popleft()
+            if self.scheduler is not None:
+                self.changed()
+                acquired = self.scheduler.acquire(request.model_name, request.cancel)
+            else:
+                acquired = False
+            with self.lock:
+                request.started_at = time.monotonic()
+                self.waits.append(request.wait_s())
+            self.changed()
+            try:
+                self.handle(request)
+            except Exception as e:
+                print(f"Request failed: {e}")
+            finally:
+                if acquired:
+                    self.scheduler.release(request.model_name)
+            with self.lock:
+                self.current = None
+            self.changed()
+        if self.on_idle is not None:
+            self.on_idle()
+
+    def cancel_current(self):
+        """Stop the answer being generated; the queued messages are answered next"""
+        with self.lock:
+            request = self.current
+        if request is None:
+            return False
+        request.cancel.cancel()
+        return True
+
+    def cancel_all(self):
+        """Drop the queued messages and stop the current answer; returns the dropped messages"""
+        with self.lock:
+            dropped = [request.message for request in self.pending]
+            self.pending.clear()
+        self.cancel_current()
+        self.changed()
+        return dropped
+
+    def changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def stats(self):
+        with self.lock:
+            waits = list(self.waits)
+            return {
+                "busy": self.current is not None,
+                "waiting_for_slot": self.current is not None and self.current.started_at is None,
+                "queued": len(self.pending),
+                "mean_wait_s": sum(waits) / len(waits) if waits else 0.0,
+            }
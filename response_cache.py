@@ -0,0 +1,82 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+def is_deterministic(options):
+    """Only greedy decoding or a fixed seed gives the same answer for the same prompt"""
+    options = options or {}
+    return options.get("temperature") == 0 or options.get("seed") is not None
+
+
+def make_key(digest, options, prompt):
+    """Cache key from the model digest, the sampling options and the fully rendered prompt"""
+    payload = json.dumps({"digest": digest, "options": options or {}, "prompt": prompt},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """On-disk exact-match response cache with a size cap and LRU eviction"""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.db.commit()
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+            return row[0]
+
+    def put(self, key, response):
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time())
+            )
+            self.total_bytes += size - (old[0] if old else 0)
+            self.evict()
+            self.db.commit()
+
+    def evict(self):
+        while self.total_bytes > self.max_bytes:
+            rows = self.db.execute(
+                "SELECT key, size FROM responses ORDER BY last_used LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                return
+            for key, size in rows:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    return
+
+    def stats(self):
+        with self.lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": self.total_bytes}
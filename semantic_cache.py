@@ -0,0 +1,204 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+DEFAULT_CAPACITY = 100_000
+DEFAULT_THRESHOLD = 0.95
+# Random hyperplanes for the 64-bit sign codes; fixed so codes stay valid across runs
+PLANES_SEED = 20250301
+MAX_CANDIDATES = 256
+
+M1 = np.uint64(0x5555555555555555)
+M2 = np.uint64(0x3333333333333333)
+M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+H01 = np.uint64(0x0101010101010101)
+
+
+class SemanticCache:
+    """Answers near-duplicate questions from earlier responses.
+
+    Question embeddings are kept unit-normalized in a memory-mapped float32
+    matrix on disk, together with a 64-bit random-hyperplane sign code per row.
+    A lookup makes one vectorized Hamming pass over the codes (8 bytes per
+    entry instead of 4 * dim), then computes the exact cosine similarity only
+    for the rows whose code is close enough to possibly reach the threshold.
+    Responses and row metadata live in a small SQLite file next to the matrix.
+    When the matrix is full the oldest rows are overwritten.
+    """
+
+    def __init__(self, directory, embed_model, capacity=DEFAULT_CAPACITY, threshold=DEFAULT_THRESHOLD):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.embed_model = embed_model
+        self.capacity = capacity
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.db = sqlite3.connect(os.path.join(directory, "semantic_cache.sqlite3"), check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS models (id INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (row INTEGER PRIMARY KEY, model_id INTEGER, "
+            "question TEXT, response TEXT)"
+        )
+        self.db.commit()
+        self.model_ids = dict(self.db.execute("SELECT name, id FROM models"))
+
+        info = dict(self.db.execute("SELECT key, value FROM info"))
+        self.dim = int(info["dim"]) if "dim" in info else None
+        self.count = int(info.get("count", 0))
+        if info.get("embed_model", embed_model) != embed_model or int(info.get("capacity", capacity)) != capacity:
+            self.reset()
+        self.vectors = None
+        self.row_models = None
+        self.codes = None
+        self.max_bits = max_hamming_bits(threshold)
+        self.scratch = np.empty(capacity, dtype=np.uint64)
+        self.scratch_shift = np.empty(capacity, dtype=np.uint64)
+        if self.dim:
+            self.open_matrix()
+
+    def open_matrix(self):
+        paths = [os.path.join(self.directory, name) for name in MATRIX_FILES]
+        mode = "r+" if all(os.path.exists(path) for path in paths) else "w+"
+        self.vectors = np.memmap(paths[0], dtype=np.float32, mode=mode, shape=(self.capacity, self.dim))
+        self.row_models = np.memmap(paths[1], dtype=np.int32, mode=mode, shape=(self.capacity,))
+        self.codes = np.memmap(paths[2], dtype=np.uint64, mode=mode, shape=(self.capacity,))
+        self.planes = np.random.default_rng(PLANES_SEED).standard_normal((self.dim, 64)).astype(np.float32)
+
+    def encode(self, vectors):
+        """64-bit sign codes for one or more normalized vectors"""
+        bits = np.atleast_2d(vectors) @ self.planes > 0
+        return np.packbits(bits, axis=1, bitorder="little").view(np.uint64).ravel()
+
+    def reset(self):
+        with self.lock:
+            self.vectors = None
+            self.row_models = None
+            self.codes = None
+            for name in MATRIX_FILES:
+                path = os.path.join(self.directory, name)
+                if os.path.exists(path):
+                    os.remove(path)
+            self.db.execute("DELETE FROM entries")
+            self.db.execute("DELETE FROM info")
+            self.db.commit()
+            self.dim = None
+            self.count = 0
+
+    def model_id(self, model_name):
+        model_id = self.model_ids.get(model_name)
+        if model_id is None:
+            cursor = self.db.execute("INSERT INTO models (name) VALUES (?)", (model_name,))
+            model_id = self.model_ids[model_name] = cursor.lastrowid
+        return model_id
+
+    def lookup(self, model_name, embedding):
+        """Return (response, similarity) of the closest cached question, or None below the threshold"""
+        with self.lock:
+            model_id = self.model_ids.get(model_name)
+            size = min(self.count, self.capacity)
+            if model_id is None or size == 0 or len(embedding) != self.dim:
+                self.misses += 1
+                return None
+            query = normalize(embedding)
+            distances = self.hamming(self.encode(query)[0], size)
+            candidates = np.flatnonzero(distances <= self.max_bits)
+            candidates = candidates[self.row_models[candidates] == model_id]
+            if len(candidates) > MAX_CANDIDATES:
+                nearest = np.argpartition(distances[candidates], MAX_CANDIDATES)[:MAX_CANDIDATES]
+                candidates = candidates[nearest]
+            if len(candidates) == 0:
+                self.misses += 1
+                return None
+            similarities = self.vectors[candidates] @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            best = int(candidates[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            row = self.db.execute("SELECT response FROM entries WHERE row = ?", (best,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0], similarity
+
+    def add(self, model_name, question, embedding, response):
+        with self.lock:
+            if self.dim is None:
+                self.dim = len(embedding)
+                self.open_matrix()
+                self.db.executemany("INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)", [
+                    ("dim", str(self.dim)),
+                    ("embed_model", self.embed_model),
+                    ("capacity", str(self.capacity)),
+                ])
+            elif len(embedding) != self.dim:
+                return
+            row = self.count % self.capacity
+            model_id = self.model_id(model_name)
+            vector = normalize(embedding)
+            self.vectors[row] = vector
+            self.row_models[row] = model_id
+            self.codes[row] = self.encode(vector)[0]
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries (row, model_id, question, response) VALUES (?, ?, ?, ?)",
+                (row, model_id, question, response)
+            )
+            self.count += 1
+            self.db.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('count', ?)", (str(self.count),))
+            self.db.commit()
+
+    def flush(self):
+        with self.lock:
+            if self.vectors is not None:
+                self.vectors.flush()
+                self.row_models.flush()
+                self.codes.flush()
+
+    def hamming(self, code, size):
+        """Bit distance from `code` to the first `size` stored codes (SWAR popcount, in place)"""
+        x = self.scratch[:size]
+        t = self.scratch_shift[:size]
+        np.bitwise_xor(self.codes[:size], code, out=x)
+        np.right_shift(x, np.uint64(1), out=t)
+        t &= M1
+        x -= t
+        np.right_shift(x, np.uint64(2), out=t)
+        t &= M2
+        x &= M2
+        x += t
+        np.right_shift(x, np.uint64(4), out=t)
+        x += t
+        x &= M4
+        x *= H01
+        x >>= np.uint64(56)
+        return x
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": min(self.count, self.capacity)}
+
+
+MATRIX_FILES = ("vectors.f32", "models.i32", "codes.u64")
+
+
+def max_hamming_bits(threshold):
+    """Largest code distance worth checking for a cosine threshold.
+
+    Each bit differs with probability angle / pi, so allow the expected
+    distance plus four standard deviations.
+    """
+    p = np.arccos(np.clip(threshold, -1.0, 1.0)) / np.pi
+    return int(np.ceil(64 * p + 4 * np.sqrt(64 * p * (1 - p)))) + 1
+
+
+def normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
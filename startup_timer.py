@@ -0,0 +1,38 @@
+import threading
+import time
+
+
+class StartupTimer:
+    """Collects how long each startup step took, from any thread.
+
+    `step` records a duration (steps may overlap when they run concurrently);
+    `milestone` records the time since `start`, e.g. when the window became
+    interactive. `summary` formats both for the log.
+    """
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.lock = threading.Lock()
+        self.steps = []
+        self.milestones = []
+
+    def step(self, name, seconds):
+        with self.lock:
+            self.steps.append((name, seconds))
+
+    def timed(self, name, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.step(name, time.perf_counter() - start)
+
+    def milestone(self, name):
+        with self.lock:
+            self.milestones.append((name, time.perf_counter() - self.start))
+
+    def summary(self):
+        with self.lock:
+            steps = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.steps)
+            milestones = ", ".join(f"{name} at {seconds:.2f}s" for name, seconds in self.milestones)
+        return f"{steps} | {milestones}"
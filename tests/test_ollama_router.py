@@ -0,0 +1,115 @@
+import os
+import sys
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from fake_ollama import FakeOllama  # noqa: E402
+from ollama_client import OllamaError  # noqa: E402
+from ollama_router import OllamaRouter  # noqa: E402
+
+MODEL = "llama3:latest"
+MESSAGES = [{"role": "user", "content": "Hello"}]
+# Long enough that the router never checks the nodes on its own during a test
+INTERVAL = 3600
+
+
+class RouterTest(unittest.TestCase):
+    """OllamaRouter against three fake servers on localhost"""
+
+    def setUp(self):
+        self.fakes = [FakeOllama(models=[MODEL], answer="one two three four").start() for _ in range(3)]
+        self.router = OllamaRouter([fake.base_url for fake in self.fakes], interval=INTERVAL, retries=0)
+        self.router.start()
+
+    def tearDown(self):
+        self.router.stop()
+        for fake in self.fakes:
+            if not fake.dropped:
+                fake.stop()
+
+    def chat(self):
+        return "".join(self.router.chat(MODEL, MESSAGES))
+
+    def generations(self):
+        return [fake.generations for fake in self.fakes]
+
+    def test_prefers_node_with_model_resident(self):
+        self.fakes[2].loaded.add(MODEL)
+        self.router.check_all()
+        for _ in range(3):
+            self.assertEqual(self.chat(), "one two three four")
+        self.assertEqual(self.generations(), [0, 0, 3])
+
+    def test_show_does_not_count_model_as_resident(self):
+        self.router.check_all()
+        self.router.show(MODEL)
+        # Show loads nothing, so the node that answered it gets no preference for chats
+        self.assertEqual([node["resident"] for node in self.router.stats()], [[], [], []])
+        self.chat()
+        self.assertEqual([node["resident"] for node in self.router.stats()], [[MODEL], [], []])
+
+    def test_picks_least_loaded_node(self):
+        for fake in self.fakes:
+            fake.loaded.add(MODEL)
+        self.router.check_all()
+        streams = [self.router.chat(MODEL, MESSAGES) for _ in range(3)]
+        try:
+            # Each open stream stays in flight, so the next request goes to an idle node
+            for stream in streams:
+                next(stream)
+            self.assertEqual(self.generations(), [1, 1, 1])
+            self.assertEqual([node["in_flight"] for node in self.router.stats()], [1, 1, 1])
+        finally:
+            for stream in streams:
+                stream.close()
+        self.assertEqual([node["in_flight"] for node in self.router.stats()], [0, 0, 0])
+
+    def test_fails_over_before_first_chunk(self):
+        self.fakes[0].loaded.add(MODEL)
+        self.router.check_all()
+        # The router has not noticed yet: the request is sent to the dropped node first
+        self.fakes[0].drop()
+        self.assertEqual(self.chat(), "one two three four")
+        self.assertEqual(sum(self.generations()[1:]), 1)
+        self.assertFalse(self.router.stats()[0]["healthy"])
+
+    def test_raises_after_first_chunk(self):
+        self.fakes[0].loaded.add(MODEL)
+        self.fakes[0].token_delay = 0.05
+        self.router.check_all()
+        stream = self.router.chat(MODEL, MESSAGES)
+        self.assertEqual(next(stream), "one")
+        self.fakes[0].drop()
+        with self.assertRaises(requests.exceptions.RequestException):
+            list(stream)
+        # The answer was not sent again to another node
+        self.assertEqual(self.generations(), [1, 0, 0])
+        self.assertFalse(self.router.stats()[0]["healthy"])
+
+    def test_listing_models_fails_when_every_node_is_down(self):
+        for fake in self.fakes:
+            fake.drop()
+        self.router.check_all()
+        with self.assertRaises(OllamaError):
+            self.router.list_models()
+
+    def test_reaches_dropped_node_after_it_recovers(self):
+        port = self.fakes[0].server.server_address[1]
+        self.fakes[0].drop()
+        self.router.check_all()
+        self.assertFalse(self.router.stats()[0]["healthy"])
+
+        self.fakes[0] = FakeOllama(port=port, models=[MODEL], answer="one two three four").start()
+        self.fakes[0].loaded.add(MODEL)
+        self.router.check_all()
+        self.assertTrue(self.router.stats()[0]["healthy"])
+        self.assertEqual(self.chat(), "one two three four")
+        self.assertEqual(self.generations(), [1, 0, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import sys
+import threading
+import time
+from collections import deque
+
+# One tick per frame; every UI update posted from worker threads is applied on a tick
+UI_TICK_MS = 16
+# Number of recent ticks the lag percentiles are computed over
+LAG_WINDOW = 300
+
+
+class UIDispatcher:
+    """Thread-safe queue of UI updates, drained on the Tk thread at a fixed rate.
+
+    Worker threads post updates instead of calling `window.after(0, ...)` for
+    each one. Every tick applies the queued updates in order, with two kinds
+    merged first:
+
+    - `latest(key, callback)`: only the last update per key in a tick runs,
+      for state where intermediate values are never seen (status text,
+      progress bar, button states).
+    - `batch(sink, item)`: consecutive items for the same sink are passed to
+      it as one list, so a burst of streamed tokens or messages becomes a
+      single widget insert.
+
+    `stats()` reports the queue depth seen by the ticks and how late the
+    ticks ran (event-loop lag).
+    """
+
+    def __init__(self, window, interval_ms=UI_TICK_MS):
+        self.window = window
+        self.interval_ms = interval_ms
+        self.lock = threading.Lock()
+        self.events = []
+        self.after_id = None
+        self.expected_at = None
+        self.ticks = 0
+        self.posted = 0
+        self.coalesced = 0
+        self.last_depth = 0
+        self.max_depth = 0
+        self.lags_ms = deque(maxlen=LAG_WINDOW)
+        self.max_lag_ms = 0.0
+
+    def start(self):
+        self.schedule()
+
+    def stop(self):
+        if self.after_id is not None:
+            self.window.after_cancel(self.after_id)
+            self.after_id = None
+
+    def call(self, callback):
+        self.post(("call", None, callback))
+
+    def latest(self, key, callback):
+        self.post(("latest", key, callback))
+
+    def batch(self, sink, item):
+        self.post(("batch", sink, item))
+
+    def post(self, event):
+        with self.lock:
+            self.events.append(event)
+            self.posted += 1
+
+    def schedule(self):
+        self.expected_at = time.perf_counter() + self.interval_ms / 1000
+        self.after_id = self.window.after(self.interval_ms, self.tick)
+
+    def tick(self):
+        lag_ms = max(0.0, (time.perf_counter() - self.expected_at) * 1000)
+        self.lags_ms.append(lag_ms)
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        with self.lock:
+            events = self.events
+            self.events = []
+        self.ticks += 1
+        self.last_depth = len(events)
+        self.max_depth = max(self.max_depth, len(events))
+        try:
+            self.drain(events)
+        finally:
+            self.schedule()
+
+    def drain(self, events):
+        # Keep only the last update for each key, in the position it was posted
+        last_for_key = {}
+        for i, (kind, key, _) in enumerate(events):
+            if kind == "latest":
+                last_for_key[key] = i
+        self.coalesced += sum(1 for kind, _, _ in events if kind == "latest") - len(last_for_key)
+
+        i = 0
+        while i < len(events):
+            kind, key, payload = events[i]
+            if kind == "batch":
+                items = [payload]
+                while i + 1 < len(events) and events[i + 1][0] == "batch" and events[i + 1][1] == key:
+                    i += 1
+                    items.append(events[i][2])
+                self.coalesced += len(items) - 1
+                self.run(key, items)
+            elif kind == "call" or last_for_key[key] == i:
+                self.run(payload)
+            i += 1
+
+    def run(self, callback, *args):
+        try:
+            callback(*args)
+        except Exception:
+            self.window.report_callback_exception(*sys.exc_info())
+
+    def stats(self):
+        with self.lock:
+            depth = len(self.events)
+        lags = sorted(self.lags_ms)
+        return {
+            "queue_depth": depth,
+            "last_tick_depth": self.last_depth,
+            "max_queue_depth": self.max_depth,
+            "posted": self.posted,
+            "coalesced": self.coalesced,
+            "ticks": self.ticks,
+            "lag_ms": lags[len(lags) // 2] if lags else 0.0,
+            "p95_lag_ms": lags[int(len(lags) * 0.95) - 1] if lags else 0.0,
+            "max_lag_ms": self.max_lag_ms,
+        }